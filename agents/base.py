@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+from typing import AsyncContextManager
+
 import config
 from agents.providers import (
-    LLMProvider, Usage, create_provider, PROVIDERS,
+    LLMProvider, LLMResponse, ToolCall, Usage, provider_pool, PROVIDERS,
 )
 from discussion.search import (
     SEARCH_TOOL_DEFINITION, IMAGE_SEARCH_TOOL_DEFINITION,
@@ -22,13 +25,13 @@ class Agent:
 
     # ── provider / config helpers ──
 
-    def _get_provider(self, api_keys: dict | None = None) -> LLMProvider:
-        """Create the correct provider based on session settings."""
+    def _checkout_provider(self, api_keys: dict | None = None) -> AsyncContextManager[LLMProvider]:
+        """Check out a pooled provider for the session settings."""
         keys = api_keys or {}
         provider_key = keys.get("provider", config.DEFAULT_PROVIDER)
         model = keys.get("model", config.DEFAULT_MODEL)
         api_key = keys.get("api_key", "") or config.ANTHROPIC_API_KEY
-        return create_provider(provider_key, api_key, model)
+        return provider_pool.checkout(provider_key, api_key, model)
 
     def _get_brave_key(self, api_keys: dict | None = None) -> str:
         return (api_keys or {}).get("brave_api_key", "") or config.BRAVE_API_KEY
@@ -41,76 +44,100 @@ class Agent:
 
     # ── main response methods ──
 
-    async def stream_response(self, messages: list[dict], api_keys: dict | None = None):
+    async def stream_response(self, messages: list[dict], api_keys: dict | None = None,
+                              tool_slots: asyncio.Semaphore | None = None,
+                              search_stats: dict | None = None):
         """Stream a response, handling tool use transparently.
 
+        Text is streamed from the first call. If the model requests tools, they
+        are executed (concurrently, within ``tool_slots``) and the conversation
+        continues on a fresh stream. Search cache lookups are counted in
+        ``search_stats`` (see ``SearchCache.open_session``).
         Yields text chunks (str), then a final Usage object.
         """
-        provider = self._get_provider(api_keys)
         tools = self._get_tools(api_keys)
         brave_key = self._get_brave_key(api_keys)
         current_messages = list(messages)
         max_tool_rounds = 3
         total_usage = Usage()
-
-        # Tool-use loop (non-streaming)
-        for _ in range(max_tool_rounds):
-            resp = await provider.create(
-                system=self.system_prompt,
-                messages=current_messages,
-                tools=tools or None,
-                max_tokens=config.MAX_TOKENS,
-            )
-            total_usage += resp.usage
-
-            if resp.stop_reason == "tool_use" and resp.tool_calls:
-                tool_results = self._process_tool_calls(resp.tool_calls, brave_key)
-                # Build assistant content for the conversation
-                assistant_content = self._build_assistant_content(resp)
-                current_messages.append({"role": "assistant", "content": assistant_content})
+        streamed_text = False
+
+        # Held for the whole tool loop: the pool won't close it under us
+        async with self._checkout_provider(api_keys) as provider:
+            for tool_round in range(max_tool_rounds + 1):
+                resp = LLMResponse()
+                async for item in provider.stream(
+                    system=self.system_prompt,
+                    messages=current_messages,
+                    tools=tools or None,
+                    max_tokens=config.MAX_TOKENS,
+                ):
+                    if isinstance(item, Usage):
+                        total_usage += item
+                    elif isinstance(item, ToolCall):
+                        resp.tool_calls.append(item)
+                    else:
+                        if streamed_text and not resp.text:
+                            # Separate pre-tool preamble from the text of the follow-up call
+                            yield "\n\n"
+                        resp.text += item
+                        streamed_text = True
+                        yield item
+
+                # Stop on a plain answer, or once the tool round budget is spent
+                if not resp.tool_calls or tool_round == max_tool_rounds:
+                    break
+
+                tool_results = await self._process_tool_calls(resp.tool_calls, brave_key, tool_slots,
+                                                              search_stats)
+                current_messages.append({"role": "assistant", "content": self._build_assistant_content(resp)})
                 current_messages.append({"role": "user", "content": tool_results})
-                continue
-            break
-
-        # Stream the final response
-        async for item in provider.stream(
-            system=self.system_prompt,
-            messages=current_messages,
-            tools=tools or None,
-            max_tokens=config.MAX_TOKENS,
-        ):
-            if isinstance(item, Usage):
-                total_usage += item
-            else:
-                yield item
 
         # Yield final usage
         yield total_usage
 
     # ── tool handling ──
 
-    def _process_tool_calls(self, tool_calls, brave_api_key: str = "") -> list[dict]:
-        results = []
-        for tc in tool_calls:
-            if tc.name == "web_search":
-                query = tc.input.get("query", "")
-                search_results = execute_search(query, brave_api_key=brave_api_key)
-                formatted = format_search_results(search_results)
-                results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tc.id,
-                    "content": formatted,
-                })
-            elif tc.name == "image_search":
-                query = tc.input.get("query", "")
-                image_results = execute_image_search(query, brave_api_key=brave_api_key)
-                formatted = format_image_results(image_results)
-                results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tc.id,
-                    "content": formatted,
-                })
-        return results
+    async def _process_tool_calls(self, tool_calls, brave_api_key: str = "",
+                                  slots: asyncio.Semaphore | None = None,
+                                  search_stats: dict | None = None) -> list[dict]:
+        """Run a round's tool calls concurrently; results keep the calls' order.
+
+        ``slots`` caps how many calls run at once across the session (a fresh
+        cap per round without one). Each call gets ``TOOL_CALL_TIMEOUT_S``,
+        queueing included; a call that misses it returns a note saying so
+        rather than holding up the turn.
+        """
+        slots = slots or asyncio.Semaphore(config.TOOL_CALL_CONCURRENCY)
+        results = await asyncio.gather(*(self._run_tool_call(tc, brave_api_key, slots, search_stats)
+                                         for tc in tool_calls))
+        return [r for r in results if r is not None]
+
+    async def _run_tool_call(self, tc, brave_api_key: str, slots: asyncio.Semaphore,
+                             search_stats: dict | None = None) -> dict | None:
+        if tc.name == "web_search":
+            execute, format_results, label = execute_search, format_search_results, "Search"
+        elif tc.name == "image_search":
+            execute, format_results, label = execute_image_search, format_image_results, "Image search"
+        else:
+            return None
+        query = tc.input.get("query", "")
+
+        async def run() -> str:
+            async with slots:
+                return format_results(await execute(query, brave_api_key=brave_api_key,
+                                                      session_stats=search_stats))
+
+        try:
+            formatted = await asyncio.wait_for(run(), config.TOOL_CALL_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            formatted = (f"{label} for {query!r} timed out after {config.TOOL_CALL_TIMEOUT_S:g}s; "
+                         f"no results. Continue with what you have.")
+        return {
+            "type": "tool_result",
+            "tool_use_id": tc.id,
+            "content": formatted,
+        }
 
     def _build_assistant_content(self, resp) -> list:
         """Build assistant content list for tool-use round messages.
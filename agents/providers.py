@@ -5,15 +5,29 @@ Two provider classes handle all supported services:
 - AnthropicProvider  — for Claude models (native Anthropic API)
 - OpenAICompatibleProvider — for OpenAI, DeepSeek, Gemini, Groq (OpenAI-compatible APIs)
 
+MockProvider simulates a model locally for offline benchmarks and load tests.
+
 Each provider normalises responses into a common format so the Agent class
 can work identically regardless of which backend is selected.
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import logging
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator
+from urllib.parse import parse_qsl
+
+import config
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Common data structures
@@ -21,16 +35,39 @@ from typing import AsyncGenerator
 
 @dataclass
 class Usage:
-    input_tokens: int = 0
+    input_tokens: int = 0  # uncached input tokens
     output_tokens: int = 0
+    cache_read_tokens: int = 0  # input tokens served from the provider's prompt cache
+    cache_write_tokens: int = 0  # input tokens written to the prompt cache
+    # Why the call that produced this usage stopped: "end_turn", "max_tokens" or "tool_use".
+    # Accumulated usage keeps the most recent call's reason.
+    stop_reason: str = ""
 
     def __iadd__(self, other: Usage) -> Usage:
         self.input_tokens += other.input_tokens
         self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+        self.stop_reason = other.stop_reason or self.stop_reason
         return self
 
     def to_dict(self) -> dict:
-        return {"input_tokens": self.input_tokens, "output_tokens": self.output_tokens}
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+        }
+
+
+# Content blocks flagged with this key are stable prefix material (persona,
+# reference files, append-only transcript). Providers with explicit prompt
+# caching turn it into a cache breakpoint; everyone else just drops it.
+CACHEABLE = "cacheable"
+
+
+def _strip_cacheable(block: dict) -> dict:
+    return {k: v for k, v in block.items() if k != CACHEABLE}
 
 
 @dataclass
@@ -45,7 +82,7 @@ class LLMResponse:
     """Normalised response from any provider."""
     text: str = ""
     tool_calls: list[ToolCall] = field(default_factory=list)
-    stop_reason: str = ""  # "end_turn", "tool_use", etc.
+    stop_reason: str = ""  # "end_turn", "tool_use", "max_tokens"
     usage: Usage = field(default_factory=Usage)
 
 
@@ -99,6 +136,12 @@ PROVIDERS: dict[str, dict] = {
         "key_prefix": "gsk_",
         "base_url": "https://api.groq.com/openai/v1",
     },
+    "mock": {
+        "name": "Mock (offline testing)",
+        "models": [{"id": "mock", "label": "Mock"}],
+        "key_prefix": "",
+        "hidden": True,  # Selectable by key, not offered in the UI
+    },
 }
 
 
@@ -106,6 +149,8 @@ def get_providers_for_api() -> list[dict]:
     """Return provider metadata for the /api/providers endpoint."""
     out = []
     for key, p in PROVIDERS.items():
+        if p.get("hidden"):
+            continue
         out.append({
             "key": key,
             "name": p["name"],
@@ -123,6 +168,8 @@ def create_provider(provider_key: str, api_key: str, model: str) -> LLMProvider:
     """Instantiate the correct provider for the given key."""
     if provider_key == "anthropic":
         return AnthropicProvider(api_key=api_key, model=model)
+    if provider_key == "mock":
+        return MockProvider.from_model(model)
 
     meta = PROVIDERS.get(provider_key)
     if not meta:
@@ -135,6 +182,133 @@ def create_provider(provider_key: str, api_key: str, model: str) -> LLMProvider:
     )
 
 
+# ---------------------------------------------------------------------------
+# Client pool
+# ---------------------------------------------------------------------------
+
+class ProviderPool:
+    """Reuses provider instances (and their HTTP connection pools) across turns.
+
+    Entries are keyed by (provider_key, sha256(api_key), base_url, model) and
+    evicted least-recently-used beyond ``max_size`` or after ``idle_ttl``
+    seconds without use. Streams hold a provider through ``checkout``; an
+    evicted client is closed once nothing has it checked out, so a long tool
+    loop never loses its connection mid-stream.
+    """
+
+    def __init__(self, max_size: int = 32, idle_ttl: float = 600.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries: OrderedDict[tuple, tuple[LLMProvider, float]] = OrderedDict()
+        self._in_use: dict[LLMProvider, int] = {}
+        self._retired: set[LLMProvider] = set()  # Evicted while checked out
+        self._closing: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _make_key(provider_key: str, api_key: str, model: str) -> tuple:
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        base_url = PROVIDERS.get(provider_key, {}).get("base_url")
+        return (provider_key, key_hash, base_url, model)
+
+    def get(self, provider_key: str, api_key: str, model: str) -> LLMProvider:
+        """Return a pooled provider, creating one on a miss.
+
+        The client may be closed once evicted; use ``checkout`` to hold it
+        for the length of a call.
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        key = self._make_key(provider_key, api_key, model)
+        entry = self._entries.get(key)
+        if entry:
+            self.hits += 1
+            self._entries[key] = (entry[0], now)
+            self._entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        provider = create_provider(provider_key, api_key, model)
+        self._entries[key] = (provider, now)
+        while len(self._entries) > self.max_size:
+            _, (old, _) = self._entries.popitem(last=False)
+            self._retire(old)
+        return provider
+
+    @asynccontextmanager
+    async def checkout(self, provider_key: str, api_key: str, model: str) -> AsyncIterator[LLMProvider]:
+        """A pooled provider that stays open until released, even if evicted meanwhile."""
+        provider = self.get(provider_key, api_key, model)
+        self._in_use[provider] = self._in_use.get(provider, 0) + 1
+        try:
+            yield provider
+        finally:
+            users = self._in_use.pop(provider) - 1
+            if users:
+                self._in_use[provider] = users
+            elif provider in self._retired:
+                self._retired.discard(provider)
+                self._close_soon(provider)
+
+    def _evict_idle(self, now: float):
+        expired = [k for k, (_, last_used) in self._entries.items() if now - last_used > self.idle_ttl]
+        for k in expired:
+            provider, _ = self._entries.pop(k)
+            self._retire(provider)
+
+    def _retire(self, provider: LLMProvider):
+        self.evictions += 1
+        if provider in self._in_use:
+            self._retired.add(provider)  # The last checkout closes it
+        else:
+            self._close_soon(provider)
+
+    def _close_soon(self, provider: LLMProvider):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop to close on; the client is left to garbage collection
+        task = loop.create_task(self._close(provider))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(provider: LLMProvider):
+        try:
+            await provider.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close provider client: {e}")
+
+    async def aclose(self):
+        """Close every pooled and retiring client. Called on app shutdown."""
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+        providers = [p for p, _ in self._entries.values()] + list(self._retired)
+        self._entries.clear()
+        self._retired.clear()
+        for provider in providers:
+            await self._close(provider)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "in_use": len(self._in_use),
+            "retired_in_use": len(self._retired),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+provider_pool = ProviderPool()
+
+
 # ---------------------------------------------------------------------------
 # Base class
 # ---------------------------------------------------------------------------
@@ -157,53 +331,98 @@ class LLMProvider:
         messages: list[dict],
         tools: list[dict] | None,
         max_tokens: int,
-    ) -> AsyncGenerator[str | Usage, None]:
-        """Yield text chunks, then a final Usage object."""
+    ) -> AsyncGenerator[str | ToolCall | Usage, None]:
+        """Yield text chunks as they arrive, then any ToolCall objects the
+        model requested, then a final Usage object carrying the stop reason."""
         raise NotImplementedError
         yield  # make it a generator  # noqa: unreachable
 
+    async def aclose(self):
+        """Release the underlying HTTP client."""
+        client = getattr(self, "client", None)
+        if client is not None:
+            await client.close()
+
 
 # ---------------------------------------------------------------------------
 # Anthropic
 # ---------------------------------------------------------------------------
 
 class AnthropicProvider(LLMProvider):
+    # The API accepts at most four cache_control breakpoints per request
+    MAX_CACHE_BREAKPOINTS = 4
+
     def __init__(self, api_key: str, model: str):
         from anthropic import AsyncAnthropic
         self.client = AsyncAnthropic(api_key=api_key)
         self.model = model
 
     async def create(self, system, messages, tools, max_tokens) -> LLMResponse:
-        kwargs: dict = dict(
-            model=self.model,
-            max_tokens=max_tokens,
-            system=system,
-            messages=messages,
-        )
-        if tools:
-            kwargs["tools"] = tools
-
+        kwargs = self._build_kwargs(system, messages, tools, max_tokens)
         resp = await self.client.messages.create(**kwargs)
         return self._normalise(resp)
 
     async def stream(self, system, messages, tools, max_tokens):
-        kwargs: dict = dict(
-            model=self.model,
-            max_tokens=max_tokens,
-            system=system,
-            messages=messages,
-        )
-        if tools:
-            kwargs["tools"] = tools
+        kwargs = self._build_kwargs(system, messages, tools, max_tokens)
 
         async with self.client.messages.stream(**kwargs) as s:
-            async for text in s.text_stream:
-                yield text
+            async for event in s:
+                if event.type == "text":
+                    yield event.text
+            # tool_use input deltas are accumulated by the SDK into the final message
             resp = await s.get_final_message()
-            yield Usage(
-                input_tokens=resp.usage.input_tokens,
-                output_tokens=resp.usage.output_tokens,
-            )
+            for block in resp.content:
+                if block.type == "tool_use":
+                    yield ToolCall(id=block.id, name=block.name, input=block.input)
+            usage = self._usage(resp.usage)
+            usage.stop_reason = self._stop_reason(resp.stop_reason)
+            yield usage
+
+    def _build_kwargs(self, system, messages, tools, max_tokens) -> dict:
+        """Lay out the request for prompt caching.
+
+        The system prompt is always a breakpoint; content blocks flagged
+        ``cacheable`` become breakpoints in order until the API limit is used up.
+        """
+        breakpoints = 0
+        kwargs: dict = dict(model=self.model, max_tokens=max_tokens, messages=[])
+        if system:
+            kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+            breakpoints += 1
+
+        for msg in messages:
+            content = msg.get("content")
+            if isinstance(content, list):
+                blocks = []
+                for block in content:
+                    if isinstance(block, dict) and CACHEABLE in block:
+                        flagged = block[CACHEABLE]
+                        block = _strip_cacheable(block)
+                        if flagged and breakpoints < self.MAX_CACHE_BREAKPOINTS:
+                            block["cache_control"] = {"type": "ephemeral"}
+                            breakpoints += 1
+                    blocks.append(block)
+                msg = {**msg, "content": blocks}
+            kwargs["messages"].append(msg)
+
+        if tools:
+            kwargs["tools"] = tools
+        return kwargs
+
+    @staticmethod
+    def _usage(u) -> Usage:
+        return Usage(
+            input_tokens=u.input_tokens,
+            output_tokens=u.output_tokens,
+            cache_read_tokens=getattr(u, "cache_read_input_tokens", 0) or 0,
+            cache_write_tokens=getattr(u, "cache_creation_input_tokens", 0) or 0,
+        )
+
+    @staticmethod
+    def _stop_reason(raw: str | None) -> str:
+        if raw in ("tool_use", "max_tokens"):
+            return raw
+        return "end_turn"
 
     def _normalise(self, resp) -> LLMResponse:
         text_parts: list[str] = []
@@ -214,12 +433,12 @@ class AnthropicProvider(LLMProvider):
             elif block.type == "tool_use":
                 tool_calls.append(ToolCall(id=block.id, name=block.name, input=block.input))
 
-        stop = "tool_use" if resp.stop_reason == "tool_use" else "end_turn"
+        stop = self._stop_reason(resp.stop_reason)
         return LLMResponse(
             text="\n".join(text_parts),
             tool_calls=tool_calls,
             stop_reason=stop,
-            usage=Usage(resp.usage.input_tokens, resp.usage.output_tokens),
+            usage=self._usage(resp.usage),
         )
 
 
@@ -264,15 +483,37 @@ class OpenAICompatibleProvider(LLMProvider):
             kwargs["tools"] = self._translate_tools(tools)
 
         usage = Usage()
+        finish_reason = None
+        # Tool call fragments arrive keyed by index: id/name first, then argument pieces
+        pending_tools: dict[int, dict] = {}
         async for chunk in await self.client.chat.completions.create(**kwargs):
             if chunk.usage:
-                usage = Usage(
-                    input_tokens=chunk.usage.prompt_tokens or 0,
-                    output_tokens=chunk.usage.completion_tokens or 0,
-                )
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
-
+                usage = self._usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield delta.content
+            for tc in delta.tool_calls or []:
+                entry = pending_tools.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                if tc.id:
+                    entry["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        entry["name"] += tc.function.name
+                    if tc.function.arguments:
+                        entry["arguments"] += tc.function.arguments
+
+        for index in sorted(pending_tools):
+            entry = pending_tools[index]
+            try:
+                args = json.loads(entry["arguments"]) if entry["arguments"] else {}
+            except json.JSONDecodeError:
+                args = {}
+            yield ToolCall(id=entry["id"], name=entry["name"], input=args)
+
+        usage.stop_reason = self._stop_reason(finish_reason, bool(pending_tools))
         yield usage
 
     # -- message translation --
@@ -287,8 +528,9 @@ class OpenAICompatibleProvider(LLMProvider):
             role = msg["role"]
             content = msg.get("content")
 
-            # Handle Anthropic tool_result messages
+            # Handle Anthropic tool_result messages and structured text blocks
             if role == "user" and isinstance(content, list):
+                text_parts = []
                 for item in content:
                     if isinstance(item, dict) and item.get("type") == "tool_result":
                         oai.append({
@@ -296,6 +538,11 @@ class OpenAICompatibleProvider(LLMProvider):
                             "tool_call_id": item["tool_use_id"],
                             "content": item.get("content", ""),
                         })
+                    elif isinstance(item, dict) and item.get("type") == "text":
+                        text_parts.append(item.get("text", ""))
+                if text_parts:
+                    # Blocks carry their own separators, so they join back into one prompt
+                    oai.append({"role": "user", "content": "".join(text_parts)})
                 continue
 
             # Handle assistant messages with tool_use blocks
@@ -353,13 +600,29 @@ class OpenAICompatibleProvider(LLMProvider):
             })
         return oai_tools
 
+    @staticmethod
+    def _stop_reason(finish_reason: str | None, has_tool_calls: bool) -> str:
+        if has_tool_calls:
+            return "tool_use"
+        if finish_reason == "length":
+            return "max_tokens"
+        return "end_turn"
+
+    @staticmethod
+    def _usage(u) -> Usage:
+        """OpenAI-style prompt_tokens include cached ones; split them out to match Usage."""
+        details = getattr(u, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        return Usage(
+            input_tokens=(u.prompt_tokens or 0) - cached,
+            output_tokens=u.completion_tokens or 0,
+            cache_read_tokens=cached,
+        )
+
     def _normalise(self, resp) -> LLMResponse:
         choice = resp.choices[0] if resp.choices else None
         if not choice:
-            return LLMResponse(usage=Usage(
-                resp.usage.prompt_tokens or 0,
-                resp.usage.completion_tokens or 0,
-            ) if resp.usage else Usage())
+            return LLMResponse(usage=self._usage(resp.usage) if resp.usage else Usage())
 
         msg = choice.message
         text = msg.content or ""
@@ -373,10 +636,205 @@ class OpenAICompatibleProvider(LLMProvider):
                     args = {}
                 tool_calls.append(ToolCall(id=tc.id, name=tc.function.name, input=args))
 
-        stop = "tool_use" if tool_calls else "end_turn"
-        usage = Usage(
-            resp.usage.prompt_tokens or 0,
-            resp.usage.completion_tokens or 0,
-        ) if resp.usage else Usage()
+        stop = self._stop_reason(choice.finish_reason, bool(tool_calls))
+        usage = self._usage(resp.usage) if resp.usage else Usage()
 
         return LLMResponse(text=text, tool_calls=tool_calls, stop_reason=stop, usage=usage)
+
+
+# ---------------------------------------------------------------------------
+# Mock (offline load and latency testing)
+# ---------------------------------------------------------------------------
+
+class MockProviderError(Exception):
+    """A failure injected by MockProvider's error rate."""
+
+
+class MockProvider(LLMProvider):
+    """Local stand-in for a remote model, for benchmarks and load tests.
+
+    Output is deterministic: text, timing and injected events are drawn
+    from an RNG seeded with ``seed`` and the request itself, so identical
+    requests replay identically. Latency is ``ttft_ms`` to the first token,
+    then ``tokens_per_sec`` with +/- ``jitter`` (a fraction) per token.
+    ``tool_call_rate`` is the chance a call that offers tools asks for one
+    instead of answering; ``error_rate`` the chance a call raises part way.
+    Usage counts roughly 4 characters per input token, and cacheable prefix
+    blocks are reported as cache writes the first time and reads after.
+
+    Settings default to the ``MOCK_*`` config values and can be overridden
+    per session through the model id, e.g. ``mock?ttft_ms=50&tokens_per_sec=200``.
+    """
+
+    VOCABULARY = (
+        "market policy growth risk evidence data users cost regulation trade-off adoption "
+        "incentive strategy analysis impact scale model revenue margin supply demand signal "
+        "evaluation framework constraint outcome baseline uncertainty benefit trust competition "
+        "infrastructure investment research quality timeline stakeholder pressure lever forecast"
+    ).split()
+    CONNECTIVES = "the a of to and in for on with because while but so that this".split()
+    SETTINGS = {"ttft_ms": float, "tokens_per_sec": float, "jitter": float, "output_tokens": int,
+                "tool_call_rate": float, "error_rate": float, "seed": int}
+
+    def __init__(self, model: str = "mock", ttft_ms: float = 300.0, tokens_per_sec: float = 50.0,
+                 jitter: float = 0.2, output_tokens: int = 200, tool_call_rate: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.model = model
+        self.ttft_ms = ttft_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.tool_call_rate = tool_call_rate
+        self.error_rate = error_rate
+        self.seed = seed
+        self._seen_prefixes: OrderedDict[str, None] = OrderedDict()
+
+    @classmethod
+    def from_model(cls, model: str) -> MockProvider:
+        """Config defaults, overridden by query parameters on the model id."""
+        settings = {name: getattr(config, f"MOCK_{name.upper()}") for name in cls.SETTINGS}
+        for name, value in parse_qsl(model.partition("?")[2]):
+            if name in cls.SETTINGS:
+                settings[name] = cls.SETTINGS[name](value)
+        return cls(model=model, **settings)
+
+    # -- public interface --
+
+    async def create(self, system, messages, tools, max_tokens) -> LLMResponse:
+        plan = self._plan(system, messages, tools, max_tokens)
+        await asyncio.sleep(plan["ttft"] + sum(plan["delays"]))
+        if plan["fail_at"] is not None:
+            raise MockProviderError(f"Mock provider: injected error after {plan['fail_at']} tokens")
+        return LLMResponse(text="".join(plan["tokens"]), tool_calls=plan["tool_calls"],
+                           stop_reason=plan["usage"].stop_reason, usage=plan["usage"])
+
+    async def stream(self, system, messages, tools, max_tokens):
+        plan = self._plan(system, messages, tools, max_tokens)
+        await asyncio.sleep(plan["ttft"])
+        # Tokens go out in small batches so fast settings don't cost a sleep per token
+        pending, owed = "", 0.0
+        for i, (token, delay) in enumerate(zip(plan["tokens"], plan["delays"])):
+            if i == plan["fail_at"]:
+                raise MockProviderError(f"Mock provider: injected error after {i} tokens")
+            pending += token
+            owed += delay
+            if owed >= 0.01:
+                await asyncio.sleep(owed)
+                yield pending
+                pending, owed = "", 0.0
+        if pending:
+            await asyncio.sleep(owed)
+            yield pending
+        if plan["fail_at"] is not None:
+            raise MockProviderError(f"Mock provider: injected error after {plan['fail_at']} tokens")
+        for call in plan["tool_calls"]:
+            yield call
+        yield plan["usage"]
+
+    async def aclose(self):
+        pass
+
+    # -- simulation --
+
+    def _plan(self, system: str, messages: list[dict], tools: list[dict] | None, max_tokens: int) -> dict:
+        """Decide everything about one call up front from the seeded RNG."""
+        request = json.dumps([self.model, system, messages], sort_keys=True, default=str)
+        rng = random.Random(f"{self.seed}:{hashlib.sha256(request.encode()).hexdigest()}")
+        prompt_text = self._prompt_text(system, messages)
+
+        tool_calls: list[ToolCall] = []
+        answered_tools = any(isinstance(m.get("content"), list)
+                             and any(b.get("type") == "tool_result" for b in m["content"]) for m in messages)
+        if tools and not answered_tools and rng.random() < self.tool_call_rate:
+            tool = rng.choice(tools)
+            query = " ".join(rng.choice(self.VOCABULARY) for _ in range(3))
+            tool_calls.append(ToolCall(id=f"toolu_mock_{rng.getrandbits(48):012x}",
+                                       name=tool["name"], input={"query": query}))
+            tokens = self._words(rng, min(12, max_tokens))
+            stop_reason = "tool_use"
+        else:
+            tokens = self._answer(rng, system, prompt_text)
+            stop_reason = "end_turn"
+            if len(tokens) > max_tokens:
+                tokens, stop_reason = tokens[:max_tokens], "max_tokens"
+
+        spacing = 1.0 / max(self.tokens_per_sec, 1e-6)
+        delays = [spacing * (1 + self.jitter * rng.uniform(-1, 1)) for _ in tokens]
+        ttft = self.ttft_ms / 1000 * (1 + self.jitter * rng.uniform(-1, 1))
+        fail_at = rng.randrange(len(tokens) + 1) if rng.random() < self.error_rate else None
+
+        usage = Usage(output_tokens=len(tokens), stop_reason=stop_reason)
+        input_tokens = max(1, len(prompt_text) // 4)
+        cached = self._cache_prefix(system, messages)
+        if cached:
+            prefix_tokens = min(input_tokens, cached[1] // 4)
+            if cached[0]:
+                usage.cache_read_tokens = prefix_tokens
+            else:
+                usage.cache_write_tokens = prefix_tokens
+            input_tokens -= prefix_tokens
+        usage.input_tokens = input_tokens
+        return {"tokens": tokens, "delays": delays, "ttft": max(ttft, 0.0), "fail_at": fail_at,
+                "tool_calls": tool_calls, "usage": usage}
+
+    def _answer(self, rng, system: str, prompt_text: str) -> list[str]:
+        # Structured replies some callers parse, so the engine paths they drive stay realistic
+        if "Output ONLY JSON" in prompt_text:
+            return ['{"complete": true, ', '"last_topic": ""}']
+        tokens = self._words(rng, self.output_tokens)
+        if "---SENTIMENT_DATA---" in system:
+            score = round(rng.uniform(-1, 1), 2)
+            tokens += ["\n---SENTIMENT_DATA---\n", json.dumps({
+                "viewpoints": [{"id": 0, "label": "Viewpoint A"}, {"id": 1, "label": "Viewpoint B"}],
+                "scores": {"Panel": score}, "reasons": {"Panel": "Mock reasoning"},
+                "consensus": round(1 - abs(score), 2),
+            })]
+        return tokens
+
+    def _words(self, rng, count: int) -> list[str]:
+        """``count`` word tokens forming sentences; the last one ends the sentence."""
+        tokens: list[str] = []
+        sentence_left = 0
+        for i in range(count):
+            pool = self.VOCABULARY if rng.random() < 0.6 else self.CONNECTIVES
+            word = rng.choice(pool)
+            if sentence_left == 0:
+                word = word.capitalize()
+                sentence_left = rng.randint(8, 20)
+            sentence_left -= 1
+            if sentence_left == 0 or i == count - 1:
+                word += "."
+                sentence_left = 0
+            tokens.append(word if i == 0 else " " + word)
+        return tokens
+
+    @staticmethod
+    def _prompt_text(system: str, messages: list[dict]) -> str:
+        parts = [system]
+        for m in messages:
+            content = m.get("content")
+            if isinstance(content, str):
+                parts.append(content)
+            else:
+                parts.extend(str(b.get("text") or b.get("content") or b.get("input") or "") for b in content)
+        return "\n".join(parts)
+
+    def _cache_prefix(self, system: str, messages: list[dict]) -> tuple[bool, int] | None:
+        """(already cached, prefix characters) for the request's cacheable prefix, if it has one."""
+        text, prefix = system, ""
+        for m in messages:
+            if not isinstance(m.get("content"), list):
+                break
+            for block in m["content"]:
+                text += str(block.get("text", ""))
+                if block.get(CACHEABLE):
+                    prefix = text
+        if not prefix:
+            return None
+        key = hashlib.sha256(prefix.encode()).hexdigest()
+        hit = key in self._seen_prefixes
+        self._seen_prefixes[key] = None
+        self._seen_prefixes.move_to_end(key)
+        while len(self._seen_prefixes) > 256:
+            self._seen_prefixes.popitem(last=False)
+        return hit, len(prefix)
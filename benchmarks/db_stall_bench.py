@@ -0,0 +1,87 @@
+"""Event-loop stall benchmark: blocking sqlite calls vs. the async ``db`` API.
+
+Simulates several sessions persisting concurrently (a receipt plus a state
+save per turn, with a realistically sized transcript) while a heartbeat task
+measures how late the event loop wakes it. "blocking" calls the per-call
+connection helpers inline, as handlers used to; "async" awaits ``db`` the
+way the engine persists a leased session.
+
+    python -m benchmarks.db_stall_bench [sessions] [turns]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import database
+
+TICK = 0.001
+STATE = {"topic": "Bench", "messages": [{"agent_name": "Biz", "content": "x" * 1500, "round_num": 1}] * 40}
+
+
+async def heartbeat(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+def receipt(session_id: str, turn: int) -> dict:
+    return dict(session_id=session_id, agent_name="Biz", round_num=turn, input_tokens=1000,
+                output_tokens=300, estimated_cost=0.01, provider="anthropic", model="bench")
+
+
+async def blocking_session(session_id: str, turns: int):
+    for turn in range(turns):
+        database.log_receipt(**receipt(session_id, turn))
+        database.update_session_state(session_id, STATE, turn)
+        database.get_session(session_id)
+        await asyncio.sleep(0)
+
+
+async def async_session(session_id: str, turns: int):
+    await database.db.claim_session(session_id)
+    header = {k: v for k, v in STATE.items() if k != "messages"}
+    for turn in range(turns):
+        await database.db.log_receipt(**receipt(session_id, turn))
+        await database.db.save_discussion(session_id, 0, STATE["messages"], turn, header)
+        await database.db.get_session(session_id)
+
+
+async def run(session_fn, sessions: int, turns: int) -> tuple[float, list[float]]:
+    ids = [database.create_session("Bench", [], "", "", {}) for _ in range(sessions)]
+    lags: list[float] = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(session_fn(sid, turns) for sid in ids))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, lags
+
+
+def report(name: str, elapsed: float, lags: list[float]):
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(f"{name:>8}: {elapsed * 1000:7.0f} ms total, loop lag median "
+          f"{statistics.median(lags_ms):6.2f} ms, p99 {p99:6.2f} ms, max {lags_ms[-1]:6.2f} ms")
+
+
+async def main(sessions: int, turns: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        report("blocking", *await run(blocking_session, sessions, turns))
+        report("async", *await run(async_session, sessions, turns))
+        print(f"  writer: {database.db.stats()}")
+        await database.db.close()
+
+
+if __name__ == "__main__":
+    n_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_turns = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    asyncio.run(main(n_sessions, n_turns))
@@ -0,0 +1,99 @@
+"""Offline DiscussionEngine throughput against the mock provider.
+
+Runs concurrent in-process sessions, each doing a few rounds of a parallel
+panel, with every model call served by ``MockProvider``. Reports agent turns
+per second and time from ``agent_start`` to an agent's first chunk, which
+includes prompt building, provider TTFT and chunk buffering. The model id
+carries the mock settings, so latency profiles can be compared directly:
+
+    python -m benchmarks.engine_throughput [sessions] [rounds] [mock model id]
+    python -m benchmarks.engine_throughput 32 3 "mock?ttft_ms=400&tokens_per_sec=80"
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PANEL = ["biz", "creatia", "dr_nova", "devils_advocate"]
+
+
+class BenchSocket:
+    """Feeds a session its commands, releasing each once the last one finished."""
+
+    def __init__(self, commands: list[dict], first_chunks: list[float]):
+        self.commands = list(commands)
+        self.first_chunks = first_chunks
+        self.turns = 0
+        self.errors = 0
+        self._ready = asyncio.Event()
+        self._ready.set()
+        self._started: dict[str, float] = {}
+
+    async def receive_text(self) -> str:
+        if not self.commands:
+            await asyncio.Event().wait()  # Session ends on "end"; never read past it
+        await self._ready.wait()
+        self._ready.clear()
+        return json.dumps(self.commands.pop(0))
+
+    async def send_text(self, text: str):
+        msg = json.loads(text)
+        if msg["type"] == "agent_start":
+            self._started[msg["agent_key"]] = time.perf_counter()
+        elif msg["type"] == "agent_chunk" and msg["agent_key"] in self._started:
+            self.first_chunks.append(time.perf_counter() - self._started.pop(msg["agent_key"]))
+        elif msg["type"] == "agent_done":
+            self.turns += 1
+        elif msg["type"] == "error":
+            self.errors += 1
+        elif msg["type"] in ("ready", "round_start"):
+            self._ready.set()
+
+
+async def main(sessions: int, rounds: int, model: str):
+    from agents.registry import AgentRegistry
+    from database import db
+    from discussion.engine import DiscussionEngine
+
+    engine = DiscussionEngine(AgentRegistry())
+    api_keys = {"provider": "mock", "model": model, "search_prefetch": False}
+    commands = []
+    for r in range(rounds):
+        if r:
+            commands.append({"action": "new_round"})
+        commands.append({"action": "run_batch", "agent_keys": PANEL, "parallel": True})
+    commands.append({"action": "end"})
+
+    first_chunks: list[float] = []
+    sockets = [BenchSocket(commands, first_chunks) for _ in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(engine.run_session(ws, f"Benchmark topic {n}", PANEL, api_keys=api_keys)
+                           for n, ws in enumerate(sockets)))
+    elapsed = time.perf_counter() - start
+    await db.close()
+
+    turns = sum(ws.turns for ws in sockets)
+    ordered = sorted(first_chunks)
+    print(f"{sessions} sessions x {rounds} rounds, model {model!r}")
+    print(f"  {turns} agent turns in {elapsed:.2f}s = {turns / elapsed:.1f} turns/s, "
+          f"{sum(ws.errors for ws in sockets)} errors")
+    if ordered:
+        print(f"  first chunk p50 {statistics.median(ordered) * 1000:.0f} ms, "
+              f"p95 {ordered[int(len(ordered) * 0.95)] * 1000:.0f} ms")
+    print(f"  streaming: {engine.stats()['streaming']}")
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    model = sys.argv[3] if len(sys.argv) > 3 else "mock?ttft_ms=200&tokens_per_sec=100&output_tokens=150"
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["THINKTANK_DB"] = str(Path(tmp) / "bench.db")
+        import database
+        database.init_db()
+        asyncio.run(main(sessions, rounds, model))
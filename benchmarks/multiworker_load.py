@@ -0,0 +1,145 @@
+"""Multi-worker load test against the built-in mock provider.
+
+Starts ``uvicorn main:app`` with several workers on a scratch
+database, then runs concurrent clients. Each client uploads the same report,
+opens a session, runs a turn, drops the websocket, reconnects (usually to a
+different worker), runs another turn and ends the session. A client passes
+if the final export has both turns and the uploaded file context, i.e. no
+state was stranded in the worker that served the first connection.
+
+    python -m benchmarks.multiworker_load [--workers 4] [--clients 32] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+REPORT = ("Quarterly report\n" + "Revenue grew in every region. " * 200).encode()
+# Short, fast, jitter-free replies: the point is the server, not the model
+API_KEYS = {"provider": "mock", "model": "mock?ttft_ms=5&tokens_per_sec=200&output_tokens=40&jitter=0"}
+
+
+async def recv_until(ws, *types: str) -> tuple[dict, list[dict]]:
+    """Read frames until one of ``types`` arrives; return it and everything before."""
+    seen = []
+    while True:
+        msg = json.loads(await ws.recv())
+        if msg["type"] in types:
+            return msg, seen
+        if msg["type"] == "error":
+            raise RuntimeError(msg["message"])
+        seen.append(msg)
+
+
+async def run_turn(ws, agent_key: str) -> tuple[float, float]:
+    """Run one agent; returns (time to first chunk, time to ready)."""
+    start = time.perf_counter()
+    await ws.send(json.dumps({"action": "run_agent", "agent_key": agent_key}))
+    _, before = await recv_until(ws, "agent_chunk")
+    first = time.perf_counter() - start
+    await recv_until(ws, "ready")
+    return first, time.perf_counter() - start
+
+
+async def client(base: str, n: int, timings: list[tuple[float, float]]) -> str | None:
+    """One user session; returns an error description or None on success."""
+    ws_url = base.replace("http", "ws") + "/ws/discuss"
+    async with httpx.AsyncClient(base_url=base, timeout=30) as http:
+        resp = await http.post("/api/upload", files={"files": ("report.txt", REPORT, "text/plain")})
+        file_session_id = resp.json()["file_session_id"]
+
+    init = {"topic": f"Load test topic {n}", "agents": ["biz", "creatia"],
+            "file_session_id": file_session_id, "api_keys": API_KEYS, "client_id": f"load-{n}"}
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        await ws.send(json.dumps(init))
+        created, _ = await recv_until(ws, "session_created")
+        session_id = created["session_id"]
+        await recv_until(ws, "ready")
+        timings.append(await run_turn(ws, "biz"))
+    # Dropped without "end": the next connection has to resume from shared state
+
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        await ws.send(json.dumps({**init, "session_id": session_id}))
+        created, _ = await recv_until(ws, "session_created")
+        if created["session_id"] != session_id:
+            return f"client {n}: session was not resumed"
+        await recv_until(ws, "ready")
+        timings.append(await run_turn(ws, "creatia"))
+        await ws.send(json.dumps({"action": "end"}))
+        end, _ = await recv_until(ws, "discussion_end")
+
+    export = end["export"]
+    speakers = [m["agent_name"] for m in export["messages"]]
+    if len(speakers) != 2:
+        return f"client {n}: expected 2 messages after resume, got {speakers}"
+    if "Revenue grew" not in export["file_context"]:
+        return f"client {n}: file context lost"
+    return None
+
+
+async def wait_for_server(base: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base) as http:
+        while time.monotonic() < deadline:
+            try:
+                if (await http.get("/api/agents")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def main(args):
+    base = f"http://127.0.0.1:{args.port}"
+    await wait_for_server(base)
+    timings: list[tuple[float, float]] = []
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(client(base, n, timings) for n in range(args.clients)),
+                                  return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failures = [e for e in errors if e is not None]
+    for failure in failures[:10]:
+        print(f"  FAIL {failure!r}")
+
+    first = sorted(t[0] * 1000 for t in timings)
+    total = sorted(t[1] * 1000 for t in timings)
+    print(f"{args.workers} workers, {args.clients} clients: {args.clients - len(failures)} ok, "
+          f"{len(failures)} failed in {elapsed:.1f}s")
+    if timings:
+        print(f"  first chunk p50 {statistics.median(first):.0f} ms, p95 {first[int(len(first) * 0.95)]:.0f} ms")
+        print(f"  turn        p50 {statistics.median(total):.0f} ms, p95 {total[int(len(total) * 0.95)]:.0f} ms")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parent.parent
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "THINKTANK_DB": str(Path(tmp) / "load.db")}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app",
+             "--workers", str(args.workers), "--port", str(args.port), "--log-level", "warning"],
+            cwd=root, env=env,
+        )
+        try:
+            code = asyncio.run(main(args))
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+    sys.exit(code)
@@ -0,0 +1,74 @@
+"""Micro-benchmark: incremental transcript index vs. rebuilding per turn.
+
+Simulates a session where every agent turn builds its prompt (full transcript,
+current round, older rounds, Judge verdict, last user instruction) and then
+appends its response. The "rebuild" baseline reproduces the old scan-everything
+implementation.
+
+    python -m benchmarks.transcript_bench [messages]
+"""
+
+import sys
+import time
+
+from discussion.models import Discussion, Message
+
+AGENTS = ["Dr. Nova", "Biz", "Creatia", "Devil's Advocate", "The Mediator", "The Judge", "user"]
+MESSAGES_PER_ROUND = 8
+CONTENT = "A fairly typical panelist reply with a few sentences of argument. " * 12
+
+
+def _line(m: Message) -> str:
+    label = "User" if m.agent_name == "user" else m.agent_name
+    return f"{label}: {m.content}\n"
+
+
+def rebuild_turn(d: Discussion, current_round: int):
+    lines = [f"Topic: {d.topic}\n"]
+    cur = 0
+    for m in d.messages:
+        if m.round_num != cur:
+            cur = m.round_num
+            lines.append(f"\n--- Round {cur} ---\n")
+        lines.append(_line(m))
+    "\n".join(lines)
+    "\n".join([f"\n--- Round {current_round} ---\n"]
+              + [_line(m) for m in d.messages if m.round_num == current_round])
+    older = [f"Topic: {d.topic}\n"]
+    cur = 0
+    for m in d.messages:
+        if m.round_num >= current_round:
+            break
+        if m.round_num != cur:
+            cur = m.round_num
+            older.append(f"\n--- Round {cur} ---\n")
+        older.append(_line(m))
+    "\n".join(older)
+    next((m for m in reversed(d.messages) if m.agent_name == "The Judge"), None)
+    next((m for m in reversed(d.messages) if m.agent_name == "user"), None)
+
+
+def indexed_turn(d: Discussion, current_round: int):
+    d.get_transcript()
+    d.get_current_round_transcript(current_round)
+    d.get_older_rounds_transcript(current_round)
+    d.latest_message("The Judge")
+    d.latest_message("user")
+
+
+def run(turn, n_messages: int) -> float:
+    d = Discussion(topic="Should cities ban cars from downtown cores?")
+    start = time.perf_counter()
+    for i in range(n_messages):
+        round_num = i // MESSAGES_PER_ROUND + 1
+        turn(d, round_num)
+        d.add_message(Message(AGENTS[i % len(AGENTS)], CONTENT, round_num))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    slow = run(rebuild_turn, n)
+    fast = run(indexed_turn, n)
+    print(f"{n} messages: rebuild {slow * 1000:.1f} ms, indexed {fast * 1000:.1f} ms, "
+          f"speedup {slow / fast:.1f}x")
@@ -9,3 +9,35 @@ DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "claude-sonnet-4-5-20250929")
 MAX_TOKENS = 1024
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY", "")
 BRAVE_SAFESEARCH = os.getenv("BRAVE_SAFESEARCH", "moderate")
+BRAVE_RATE_PER_SEC = float(os.getenv("BRAVE_RATE_PER_SEC", "1"))  # Per API key; 1 on the free plan
+BRAVE_BURST = float(os.getenv("BRAVE_BURST", "1"))
+BRAVE_MAX_CONNECTIONS = int(os.getenv("BRAVE_MAX_CONNECTIONS", "20"))
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))  # Per session
+TOOL_CALL_TIMEOUT_S = float(os.getenv("TOOL_CALL_TIMEOUT_S", "15"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", "3600"))
+SEARCH_CACHE_ENTRIES = int(os.getenv("SEARCH_CACHE_ENTRIES", "1024"))  # In memory; SQLite holds the rest
+SEARCH_PREFETCH = os.getenv("SEARCH_PREFETCH", "0") == "1"  # Opt-in; sessions can override with "search_prefetch"
+SEARCH_PREFETCH_QUERIES = int(os.getenv("SEARCH_PREFETCH_QUERIES", "3"))
+SEARCH_PREFETCH_WAIT_S = float(os.getenv("SEARCH_PREFETCH_WAIT_S", "0.5"))  # Longest a round-1 agent waits for it
+PARALLEL_AGENT_LIMIT = int(os.getenv("PARALLEL_AGENT_LIMIT", "4"))
+CHUNK_FLUSH_MS = int(os.getenv("CHUNK_FLUSH_MS", "30"))
+CHUNK_FLUSH_BYTES = int(os.getenv("CHUNK_FLUSH_BYTES", "512"))
+POST_TURN_BACKLOG = int(os.getenv("POST_TURN_BACKLOG", "32"))
+FILE_CONTEXT_CACHE_BYTES = int(os.getenv("FILE_CONTEXT_CACHE_MB", "64")) * 1024 * 1024
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_TIMEOUT_S = float(os.getenv("EXTRACT_TIMEOUT_S", "60"))
+EXTRACT_MEMORY_MB = int(os.getenv("EXTRACT_MEMORY_MB", "1024"))
+EXCEL_TOKEN_BUDGET = int(os.getenv("EXCEL_TOKEN_BUDGET", "3000"))  # Shared by all sheets of a workbook
+UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_MB", "200")) * 1024 * 1024
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_MB", "500")) * 1024 * 1024
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_KB", "1024")) * 1024
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+
+# MockProvider defaults (provider "mock"); overridable per session via the model id
+MOCK_TTFT_MS = float(os.getenv("MOCK_TTFT_MS", "300"))
+MOCK_TOKENS_PER_SEC = float(os.getenv("MOCK_TOKENS_PER_SEC", "50"))
+MOCK_JITTER = float(os.getenv("MOCK_JITTER", "0.2"))
+MOCK_OUTPUT_TOKENS = int(os.getenv("MOCK_OUTPUT_TOKENS", "200"))
+MOCK_TOOL_CALL_RATE = float(os.getenv("MOCK_TOOL_CALL_RATE", "0"))
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_SEED = int(os.getenv("MOCK_SEED", "0"))
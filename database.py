@@ -1,12 +1,44 @@
 """SQLite database layer for persistent sessions and usage receipts."""
 
+import asyncio
+import hashlib
+import os
+import queue
+import socket
 import sqlite3
 import json
+import logging
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
-DB_PATH = Path(__file__).parent / "thinktank.db"
+logger = logging.getLogger(__name__)
+
+# Every worker process must point at the same file; override for tests and load runs
+DB_PATH = Path(os.getenv("THINKTANK_DB", Path(__file__).parent / "thinktank.db"))
+
+# Disk budget for file-context blobs; least recently used unreferenced blobs go first
+BLOB_STORE_MAX_BYTES = 512 * 1024 * 1024
+
+# Disk budget for cached extraction results, evicted least recently used first
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# A live session is leased to the worker process serving its websocket. The
+# session renews it on a timer and on every save; a worker that died leaves it
+# to expire after this long.
+SESSION_LEASE_TTL = 60.0
+
+
+class SessionLeaseLost(Exception):
+    """This worker no longer holds the lease of the session it is writing."""
+
+
+def worker_id() -> str:
+    """Identifies this worker process in session leases."""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
 # Server-side pricing table (per million tokens)
 PRICING = {
@@ -24,9 +56,21 @@ PRICING = {
 }
 
 
-def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+# Prompt-cache pricing as multiples of the input price: (read, write).
+# Anthropic bills cache writes at a premium; OpenAI-style automatic caching only discounts reads.
+CACHE_PRICING = {
+    "claude-sonnet-4-5-20250929": (0.1, 1.25),
+    "claude-haiku-4-5-20251001": (0.1, 1.25),
+}
+DEFAULT_CACHE_PRICING = (0.5, 1.0)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int,
+                  cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
     input_price, output_price = PRICING.get(model, (3.0, 15.0))
-    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    read_mult, write_mult = CACHE_PRICING.get(model, DEFAULT_CACHE_PRICING)
+    cached = (cache_read_tokens * read_mult + cache_write_tokens * write_mult) * input_price
+    return (input_tokens * input_price + output_tokens * output_price + cached) / 1_000_000
 
 
 def _get_conn() -> sqlite3.Connection:
@@ -36,6 +80,21 @@ def _get_conn() -> sqlite3.Connection:
     return conn
 
 
+def _open_worker_conn() -> sqlite3.Connection:
+    """Long-lived connection for a database thread.
+
+    WAL lets readers run alongside the writer; ``synchronous=NORMAL`` is the
+    recommended pairing and skips an fsync per commit. The enlarged statement
+    cache keeps every query below prepared for the connection's lifetime.
+    """
+    conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
 def init_db():
     conn = _get_conn()
     conn.executescript("""
@@ -61,6 +120,8 @@ def init_db():
             round_num INTEGER NOT NULL,
             input_tokens INTEGER DEFAULT 0,
             output_tokens INTEGER DEFAULT 0,
+            cache_read_tokens INTEGER DEFAULT 0,
+            cache_write_tokens INTEGER DEFAULT 0,
             estimated_cost REAL DEFAULT 0.0,
             provider TEXT DEFAULT '',
             model TEXT DEFAULT '',
@@ -68,6 +129,44 @@ def init_db():
             FOREIGN KEY (session_id) REFERENCES sessions(id)
         );
 
+        -- Append-only: one row per discussion message, seq = position in the discussion
+        CREATE TABLE IF NOT EXISTS messages (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            agent_name TEXT NOT NULL,
+            content TEXT NOT NULL,
+            round_num INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq),
+            FOREIGN KEY (session_id) REFERENCES sessions(id)
+        ) WITHOUT ROWID;
+
+        -- Content-addressed file contexts (sha256 of the UTF-8 text), shared by sessions
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            last_used_at TEXT NOT NULL
+        );
+
+        -- Extracted text per uploaded file, keyed by "sha256:extension:extractor version"
+        CREATE TABLE IF NOT EXISTS extraction_cache (
+            key TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_extraction_last_used ON extraction_cache(last_used_at);
+
+        -- Brave results keyed by "kind:safesearch:count:normalized query"; created_at is unix time
+        CREATE TABLE IF NOT EXISTS search_cache (
+            key TEXT PRIMARY KEY,
+            results TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_created ON search_cache(created_at);
+
         CREATE INDEX IF NOT EXISTS idx_receipts_session ON chat_receipts(session_id);
         CREATE INDEX IF NOT EXISTS idx_receipts_timestamp ON chat_receipts(timestamp);
         CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions(status);
@@ -77,67 +176,273 @@ def init_db():
         conn.execute("ALTER TABLE sessions ADD COLUMN client_id TEXT NOT NULL DEFAULT ''")
     except sqlite3.OperationalError:
         pass  # Column already exists
+    # Migration: prompt-cache token columns on receipts
+    for column in ("cache_read_tokens", "cache_write_tokens"):
+        try:
+            conn.execute(f"ALTER TABLE chat_receipts ADD COLUMN {column} INTEGER DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+    # Migration: file context stored by reference
+    try:
+        conn.execute("ALTER TABLE sessions ADD COLUMN file_context_hash TEXT NOT NULL DEFAULT ''")
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    # Migration: session leases for multi-worker deployments
+    for column, decl in (("lease_owner", "TEXT NOT NULL DEFAULT ''"), ("lease_expires", "REAL NOT NULL DEFAULT 0")):
+        try:
+            conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {decl}")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
     conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_client ON sessions(client_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_file ON sessions(file_context_hash)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs(last_used_at)")
+    _migrate_state_blobs(conn)
     conn.commit()
     conn.close()
 
 
-def create_session(topic: str, agent_keys: list[str], provider: str,
-                   model: str, discussion_state: dict,
-                   client_id: str = "") -> str:
+def _migrate_state_blobs(conn: sqlite3.Connection):
+    """Move messages and file context embedded in legacy ``discussion_state`` JSON out of it."""
+    rows = conn.execute(
+        """SELECT id, discussion_state FROM sessions
+           WHERE instr(discussion_state, '"messages"') > 0
+              OR instr(discussion_state, '"file_context"') > 0"""
+    ).fetchall()
+    for row in rows:
+        state = json.loads(row["discussion_state"])
+        if "messages" not in state and "file_context" not in state:
+            continue  # The words only appeared inside some text
+        _update_session_state(conn, row["id"], state, None)
+
+
+# ── Queries ──
+# Each takes an open connection and neither commits nor closes it, so the same
+# code backs both the blocking helpers and the async ``db`` API below.
+
+
+def _create_session(conn: sqlite3.Connection, topic: str, agent_keys: list[str], provider: str,
+                    model: str, discussion_state: dict, client_id: str = "") -> str:
     session_id = uuid.uuid4().hex
     now = datetime.now().isoformat()
-    conn = _get_conn()
+    header, messages, file_hash = _split_state(conn, discussion_state)
     conn.execute(
         """INSERT INTO sessions (id, client_id, topic, agent_keys, provider, model,
-           discussion_state, created_at, updated_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+           discussion_state, file_context_hash, created_at, updated_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (session_id, client_id, topic, json.dumps(agent_keys), provider, model,
-         json.dumps(discussion_state), now, now),
+         json.dumps(header), file_hash or "", now, now),
     )
-    conn.commit()
-    conn.close()
+    _insert_messages(conn, session_id, 0, messages)
     return session_id
 
 
-def get_session(session_id: str) -> dict | None:
-    conn = _get_conn()
+def _get_session(conn: sqlite3.Connection, session_id: str) -> dict | None:
+    """The session row plus its ``messages`` (dicts for ``Discussion.from_export``).
+
+    The file context is not loaded; fetch ``file_context_hash`` from the blob store.
+    """
     row = conn.execute(
         "SELECT * FROM sessions WHERE id = ?",
         (session_id,),
     ).fetchone()
-    conn.close()
     if not row:
         return None
-    return dict(row)
+    session = dict(row)
+    session["messages"] = [dict(r) for r in conn.execute(
+        """SELECT agent_name, content, round_num, timestamp FROM messages
+           WHERE session_id = ? ORDER BY seq""",
+        (session_id,),
+    )]
+    return session
+
+
+def _insert_messages(conn: sqlite3.Connection, session_id: str, first_seq: int, messages: list[dict]):
+    # OR IGNORE makes re-saving already stored messages (e.g. after a resume) a no-op
+    conn.executemany(
+        """INSERT OR IGNORE INTO messages (session_id, seq, agent_name, content, round_num, timestamp)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [(session_id, first_seq + i, m["agent_name"], m["content"], m["round_num"],
+          m.get("timestamp") or datetime.now().isoformat())
+         for i, m in enumerate(messages)],
+    )
 
 
-def update_session_state(session_id: str, discussion_state: dict, current_round: int):
+def _save_discussion(conn: sqlite3.Connection, session_id: str, first_seq: int,
+                     messages: list[dict], current_round: int, state: dict | None = None):
+    """Append ``messages`` starting at ``first_seq``; rewrite the state header only if given."""
     now = datetime.now().isoformat()
-    conn = _get_conn()
+    # Another worker may have taken the session over; never append under its seqs
+    _renew_lease(conn, session_id)
+    _insert_messages(conn, session_id, first_seq, messages)
+    if state is None:
+        conn.execute(
+            "UPDATE sessions SET current_round = ?, updated_at = ? WHERE id = ?",
+            (current_round, now, session_id),
+        )
+    else:
+        conn.execute(
+            """UPDATE sessions SET discussion_state = ?, current_round = ?, updated_at = ?
+               WHERE id = ?""",
+            (json.dumps(state), current_round, now, session_id),
+        )
+
+
+def _update_session_state(conn: sqlite3.Connection, session_id: str,
+                          discussion_state: dict, current_round: int | None):
+    """Store a full export: messages as rows, file context as a blob, the rest as the header."""
+    header, messages, file_hash = _split_state(conn, discussion_state)
+    _insert_messages(conn, session_id, 0, messages)
     conn.execute(
-        """UPDATE sessions SET discussion_state = ?, current_round = ?, updated_at = ?
+        """UPDATE sessions SET discussion_state = ?, file_context_hash = COALESCE(?, file_context_hash),
+           current_round = COALESCE(?, current_round), updated_at = ?
            WHERE id = ?""",
-        (json.dumps(discussion_state), current_round, now, session_id),
+        (json.dumps(header), file_hash, current_round, datetime.now().isoformat(), session_id),
     )
-    conn.commit()
-    conn.close()
 
 
-def end_session(session_id: str):
+def _acquire_lease(conn: sqlite3.Connection, session_id: str, owner: str) -> bool | None:
+    """Lease the session to ``owner`` if it is free, already ours, or expired.
+
+    Returns None if there is no such session.
+    """
+    now = time.time()
+    acquired = conn.execute(
+        """UPDATE sessions SET lease_owner = ?, lease_expires = ?
+           WHERE id = ? AND (lease_owner IN ('', ?) OR lease_expires < ?)""",
+        (owner, now + SESSION_LEASE_TTL, session_id, owner, now),
+    ).rowcount > 0
+    if not acquired and not conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone():
+        return None
+    return acquired
+
+
+def _renew_lease(conn: sqlite3.Connection, session_id: str):
+    """Extend this worker's lease; raises SessionLeaseLost if it is no longer ours."""
+    renewed = conn.execute(
+        "UPDATE sessions SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+        (time.time() + SESSION_LEASE_TTL, session_id, worker_id()),
+    ).rowcount
+    if not renewed:
+        raise SessionLeaseLost(f"Session {session_id} is no longer leased to {worker_id()}")
+
+
+def _release_lease(conn: sqlite3.Connection, session_id: str, owner: str):
+    conn.execute(
+        "UPDATE sessions SET lease_owner = '', lease_expires = 0 WHERE id = ? AND lease_owner = ?",
+        (session_id, owner),
+    )
+
+
+def _split_state(conn: sqlite3.Connection, discussion_state: dict) -> tuple[dict, list[dict], str | None]:
+    """Split an export into (header, messages, file context hash), storing the file context.
+
+    The hash is None when the export carries no ``file_context`` key at all.
+    """
+    header = {k: v for k, v in discussion_state.items() if k not in ("messages", "file_context")}
+    file_context = discussion_state.get("file_context")
+    file_hash = None if file_context is None else _put_blob(conn, file_context) if file_context else ""
+    return header, discussion_state.get("messages", []), file_hash
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _put_blob(conn: sqlite3.Connection, text: str) -> str:
+    """Store ``text`` once under its sha256; returns the hash."""
+    key = blob_hash(text)
+    now = datetime.now().isoformat()
+    inserted = conn.execute(
+        "INSERT OR IGNORE INTO blobs (hash, data, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+        (key, text, len(text.encode()), now, now),
+    ).rowcount
+    if inserted:
+        _prune_blobs(conn, keep=key)
+    else:
+        conn.execute("UPDATE blobs SET last_used_at = ? WHERE hash = ?", (now, key))
+    return key
+
+
+def _get_blob(conn: sqlite3.Connection, key: str) -> str | None:
+    row = conn.execute("SELECT data FROM blobs WHERE hash = ?", (key,)).fetchone()
+    return row["data"] if row else None
+
+
+def _prune_blobs(conn: sqlite3.Connection, keep: str = ""):
+    """Drop least recently used blobs no session references until under budget."""
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+    if total <= BLOB_STORE_MAX_BYTES:
+        return
+    candidates = conn.execute(
+        """SELECT hash, size FROM blobs
+           WHERE hash != ? AND hash NOT IN (SELECT file_context_hash FROM sessions)
+           ORDER BY last_used_at""",
+        (keep,),
+    ).fetchall()
+    for row in candidates:
+        if total <= BLOB_STORE_MAX_BYTES:
+            break
+        conn.execute("DELETE FROM blobs WHERE hash = ?", (row["hash"],))
+        total -= row["size"]
+
+
+def _get_extraction(conn: sqlite3.Connection, key: str) -> str | None:
+    row = conn.execute("SELECT text FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+    return row["text"] if row else None
+
+
+def _touch_extraction(conn: sqlite3.Connection, key: str):
+    conn.execute("UPDATE extraction_cache SET last_used_at = ? WHERE key = ?",
+                 (datetime.now().isoformat(), key))
+
+
+def _put_extraction(conn: sqlite3.Connection, key: str, text: str) -> int:
+    """Cache an extraction result; returns how many older entries were evicted to fit it."""
+    size = len(text.encode())
+    conn.execute(
+        "INSERT OR REPLACE INTO extraction_cache (key, text, size, last_used_at) VALUES (?, ?, ?, ?)",
+        (key, text, size, datetime.now().isoformat()),
+    )
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+    evicted = 0
+    if total > EXTRACTION_CACHE_MAX_BYTES:
+        for row in conn.execute(
+            "SELECT key, size FROM extraction_cache WHERE key != ? ORDER BY last_used_at", (key,)
+        ).fetchall():
+            if total <= EXTRACTION_CACHE_MAX_BYTES:
+                break
+            conn.execute("DELETE FROM extraction_cache WHERE key = ?", (row["key"],))
+            total -= row["size"]
+            evicted += 1
+    return evicted
+
+
+def _get_search(conn: sqlite3.Connection, key: str, ttl: float) -> tuple[list[dict], float] | None:
+    """Cached results and when they were fetched, if younger than ``ttl`` seconds."""
+    row = conn.execute("SELECT results, created_at FROM search_cache WHERE key = ? AND created_at > ?",
+                       (key, time.time() - ttl)).fetchone()
+    return (json.loads(row["results"]), row["created_at"]) if row else None
+
+
+def _put_search(conn: sqlite3.Connection, key: str, results: list[dict], ttl: float) -> float:
+    """Cache search results (dropping expired entries); returns the stored timestamp."""
+    now = time.time()
+    conn.execute("INSERT OR REPLACE INTO search_cache (key, results, created_at) VALUES (?, ?, ?)",
+                 (key, json.dumps(results), now))
+    conn.execute("DELETE FROM search_cache WHERE created_at <= ?", (now - ttl,))
+    return now
+
+
+def _end_session(conn: sqlite3.Connection, session_id: str):
     now = datetime.now().isoformat()
-    conn = _get_conn()
     conn.execute(
         """UPDATE sessions SET status = 'ended', updated_at = ?
            WHERE id = ?""",
         (now, session_id),
     )
-    conn.commit()
-    conn.close()
 
 
-def list_sessions(client_id: str = "", limit: int = 10) -> list[dict]:
-    conn = _get_conn()
+def _list_sessions(conn: sqlite3.Connection, client_id: str = "", limit: int = 10) -> list[dict]:
     rows = conn.execute("""
         SELECT s.id, s.topic, s.agent_keys, s.provider, s.model,
                s.current_round, s.status, s.created_at, s.updated_at
@@ -146,48 +451,42 @@ def list_sessions(client_id: str = "", limit: int = 10) -> list[dict]:
         ORDER BY s.updated_at DESC
         LIMIT ?
     """, (client_id, limit)).fetchall()
-    conn.close()
     return [dict(r) for r in rows]
 
 
-def count_sessions(client_id: str = "") -> int:
-    conn = _get_conn()
+def _count_sessions(conn: sqlite3.Connection, client_id: str = "") -> int:
     row = conn.execute(
         "SELECT COUNT(*) as cnt FROM sessions WHERE client_id = ?",
         (client_id,),
     ).fetchone()
-    conn.close()
     return row["cnt"]
 
 
-def delete_session(session_id: str):
-    conn = _get_conn()
+def _delete_session(conn: sqlite3.Connection, session_id: str):
     conn.execute("DELETE FROM chat_receipts WHERE session_id = ?", (session_id,))
+    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
     conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
-    conn.commit()
-    conn.close()
 
 
-def log_receipt(session_id: str, agent_name: str, round_num: int,
-                input_tokens: int, output_tokens: int, estimated_cost: float,
-                provider: str, model: str):
+def _log_receipt(conn: sqlite3.Connection, session_id: str, agent_name: str, round_num: int,
+                 input_tokens: int, output_tokens: int, estimated_cost: float,
+                 provider: str, model: str,
+                 cache_read_tokens: int = 0, cache_write_tokens: int = 0):
     now = datetime.now().isoformat()
-    conn = _get_conn()
     conn.execute(
         """INSERT INTO chat_receipts
            (session_id, agent_name, round_num, input_tokens, output_tokens,
+            cache_read_tokens, cache_write_tokens,
             estimated_cost, provider, model, timestamp)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (session_id, agent_name, round_num, input_tokens, output_tokens,
+         cache_read_tokens, cache_write_tokens,
          estimated_cost, provider, model, now),
     )
-    conn.commit()
-    conn.close()
 
 
-def get_usage_summary(start_date: str | None = None, end_date: str | None = None) -> dict:
-    conn = _get_conn()
-
+def _get_usage_summary(conn: sqlite3.Connection, start_date: str | None = None,
+                       end_date: str | None = None) -> dict:
     date_filter = ""
     params: list = []
     if start_date:
@@ -202,6 +501,8 @@ def get_usage_summary(start_date: str | None = None, end_date: str | None = None
         SELECT COUNT(DISTINCT r.session_id) as total_sessions,
                COALESCE(SUM(r.input_tokens), 0) as total_input_tokens,
                COALESCE(SUM(r.output_tokens), 0) as total_output_tokens,
+               COALESCE(SUM(r.cache_read_tokens), 0) as total_cache_read_tokens,
+               COALESCE(SUM(r.cache_write_tokens), 0) as total_cache_write_tokens,
                COALESCE(SUM(r.estimated_cost), 0) as total_estimated_cost
         FROM chat_receipts r
         WHERE 1=1 {date_filter}
@@ -214,6 +515,8 @@ def get_usage_summary(start_date: str | None = None, end_date: str | None = None
                COUNT(DISTINCT r.session_id) as sessions,
                SUM(r.input_tokens) as input_tokens,
                SUM(r.output_tokens) as output_tokens,
+               SUM(r.cache_read_tokens) as cache_read_tokens,
+               SUM(r.cache_write_tokens) as cache_write_tokens,
                SUM(r.estimated_cost) as cost
         FROM chat_receipts r
         WHERE 1=1 {date_filter}
@@ -244,10 +547,295 @@ def get_usage_summary(start_date: str | None = None, end_date: str | None = None
         LIMIT 50
     """, session_params).fetchall()
 
-    conn.close()
 
     return {
         **totals,
         "by_provider": [dict(r) for r in by_provider],
         "recent_sessions": [dict(r) for r in recent],
     }
+
+
+# ── Blocking API ──
+# One short-lived connection per call. Fine for scripts and startup; request
+# handlers and the engine should await ``db`` instead.
+
+
+def _run_blocking(query, *args, **kwargs):
+    conn = _get_conn()
+    try:
+        result = query(conn, *args, **kwargs)
+        conn.commit()
+        return result
+    finally:
+        conn.close()
+
+
+def create_session(topic: str, agent_keys: list[str], provider: str,
+                   model: str, discussion_state: dict,
+                   client_id: str = "") -> str:
+    return _run_blocking(_create_session, topic, agent_keys, provider, model,
+                         discussion_state, client_id)
+
+
+def get_session(session_id: str) -> dict | None:
+    return _run_blocking(_get_session, session_id)
+
+
+def update_session_state(session_id: str, discussion_state: dict, current_round: int):
+    _run_blocking(_update_session_state, session_id, discussion_state, current_round)
+
+
+def end_session(session_id: str):
+    _run_blocking(_end_session, session_id)
+
+
+def list_sessions(client_id: str = "", limit: int = 10) -> list[dict]:
+    return _run_blocking(_list_sessions, client_id, limit)
+
+
+def count_sessions(client_id: str = "") -> int:
+    return _run_blocking(_count_sessions, client_id)
+
+
+def delete_session(session_id: str):
+    _run_blocking(_delete_session, session_id)
+
+
+def log_receipt(session_id: str, agent_name: str, round_num: int,
+                input_tokens: int, output_tokens: int, estimated_cost: float,
+                provider: str, model: str,
+                cache_read_tokens: int = 0, cache_write_tokens: int = 0):
+    _run_blocking(_log_receipt, session_id, agent_name, round_num, input_tokens,
+                  output_tokens, estimated_cost, provider, model,
+                  cache_read_tokens, cache_write_tokens)
+
+
+def get_usage_summary(start_date: str | None = None, end_date: str | None = None) -> dict:
+    return _run_blocking(_get_usage_summary, start_date, end_date)
+
+
+# ── Async API ──
+
+
+class AsyncDatabase:
+    """Non-blocking access for the event loop.
+
+    Writes go through one queue to a dedicated writer thread that owns a single
+    connection; whatever has queued up by the time it wakes is committed as one
+    transaction, so bursts of receipts and state saves share an fsync. Reads
+    run on a small thread pool, each worker holding its own connection. JSON
+    encoding of session state happens on those threads too, never on the loop.
+
+    Threads and connections are created on first use and torn down by
+    ``close()``.
+    """
+
+    def __init__(self, readers: int = 4, max_batch: int = 64):
+        self.readers = readers
+        self.max_batch = max_batch
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: threading.Thread | None = None
+        self._read_pool: ThreadPoolExecutor | None = None
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._stats = {"reads": 0, "writes": 0, "commits": 0, "max_batch": 0}
+
+    # ── lifecycle ──
+
+    def _ensure_started(self):
+        if self._writer and self._read_pool:
+            return
+        with self._start_lock:
+            if not self._writer:
+                self._writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+                self._writer.start()
+            if not self._read_pool:
+                self._read_pool = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="db-reader")
+
+    async def close(self):
+        """Finish queued writes, then close every connection."""
+        writer, pool = self._writer, self._read_pool
+        self._writer = self._read_pool = None
+        if writer:
+            self._writes.put(None)
+            await asyncio.to_thread(writer.join)
+        if pool:
+            await asyncio.to_thread(pool.shutdown, True)
+
+    # ── plumbing ──
+
+    def _write_loop(self):
+        conn = _open_worker_conn()
+        try:
+            while True:
+                batch = [self._writes.get()]
+                while batch[-1] is not None and len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._writes.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is None
+                jobs = [job for job in batch if job is not None]
+                if jobs:
+                    self._commit_batch(conn, jobs)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, jobs: list):
+        # Nothing may escape: this is the only writer thread, and if it dies
+        # every pending and future write waits forever
+        try:
+            results = self._run_batch(conn, jobs)
+        except Exception as e:
+            # BEGIN, a savepoint or COMMIT failed: none of the batch is durable
+            logger.error(f"Database write batch of {len(jobs)} failed: {e}")
+            if conn.in_transaction:
+                try:
+                    conn.rollback()
+                except Exception as rollback_error:
+                    logger.error(f"Rollback after failed batch also failed: {rollback_error}")
+            results = [(loop, future, False, e) for _, _, _, loop, future in jobs]
+        self._stats["writes"] += len(jobs)
+        self._stats["commits"] += 1
+        self._stats["max_batch"] = max(self._stats["max_batch"], len(jobs))
+        for loop, future, ok, value in results:
+            try:
+                loop.call_soon_threadsafe(_settle, future, ok, value)
+            except RuntimeError:
+                pass  # The caller's event loop is closed; nobody is waiting
+
+    @staticmethod
+    def _run_batch(conn: sqlite3.Connection, jobs: list) -> list:
+        results = []
+        conn.execute("BEGIN")
+        for query, args, kwargs, loop, future in jobs:
+            # Savepoints keep one failing write from rolling back its neighbours
+            conn.execute("SAVEPOINT job")
+            try:
+                results.append((loop, future, True, query(conn, *args, **kwargs)))
+                conn.execute("RELEASE job")
+            except Exception as e:
+                conn.execute("ROLLBACK TO job")
+                conn.execute("RELEASE job")
+                results.append((loop, future, False, e))
+        conn.commit()
+        return results
+
+    def _read_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _open_worker_conn()
+        return conn
+
+    def _run_read(self, query, args, kwargs):
+        return query(self._read_conn(), *args, **kwargs)
+
+    async def write(self, query, *args, **kwargs):
+        """Run ``query(conn, ...)`` on the writer thread and wait for its commit."""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writes.put((query, args, kwargs, loop, future))
+        return await future
+
+    async def read(self, query, *args, **kwargs):
+        """Run ``query(conn, ...)`` on a reader connection."""
+        self._ensure_started()
+        self._stats["reads"] += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._read_pool, self._run_read, query, args, kwargs)
+
+    def stats(self) -> dict:
+        return {**self._stats, "pending_writes": self._writes.qsize()}
+
+    # ── queries ──
+
+    async def create_session(self, topic: str, agent_keys: list[str], provider: str,
+                             model: str, discussion_state: dict, client_id: str = "") -> str:
+        return await self.write(_create_session, topic, agent_keys, provider, model,
+                                discussion_state, client_id)
+
+    async def get_session(self, session_id: str) -> dict | None:
+        return await self.read(_get_session, session_id)
+
+    async def save_discussion(self, session_id: str, first_seq: int, messages: list[dict],
+                              current_round: int, state: dict | None = None):
+        await self.write(_save_discussion, session_id, first_seq, messages, current_round, state)
+
+    async def put_blob(self, text: str) -> str:
+        return await self.write(_put_blob, text)
+
+    async def get_blob(self, key: str) -> str | None:
+        return await self.read(_get_blob, key)
+
+    async def get_extraction(self, key: str) -> str | None:
+        return await self.read(_get_extraction, key)
+
+    async def touch_extraction(self, key: str):
+        await self.write(_touch_extraction, key)
+
+    async def put_extraction(self, key: str, text: str) -> int:
+        return await self.write(_put_extraction, key, text)
+
+    async def get_search(self, key: str, ttl: float) -> tuple[list[dict], float] | None:
+        return await self.read(_get_search, key, ttl)
+
+    async def put_search(self, key: str, results: list[dict], ttl: float) -> float:
+        return await self.write(_put_search, key, results, ttl)
+
+    async def claim_session(self, session_id: str, wait: float = 10.0, poll: float = 0.1) -> bool | None:
+        """Lease a session to this worker before loading it.
+
+        A session whose websocket just moved here is usually still leased to
+        the previous worker while it flushes its last writes; wait for that
+        (up to ``wait`` seconds). A lease that is still live after that
+        belongs to a session open elsewhere and is never taken over.
+        Returns True once leased, False if another worker holds it, and None
+        if the session does not exist.
+        """
+        owner = worker_id()
+        deadline = time.monotonic() + wait
+        while True:
+            acquired = await self.write(_acquire_lease, session_id, owner)
+            if acquired is not False or time.monotonic() >= deadline:
+                return acquired
+            await asyncio.sleep(poll)
+
+    async def renew_session(self, session_id: str):
+        """Keep this worker's lease alive; raises SessionLeaseLost if it was lost."""
+        await self.write(_renew_lease, session_id)
+
+    async def release_session(self, session_id: str):
+        await self.write(_release_lease, session_id, worker_id())
+
+    async def end_session(self, session_id: str):
+        await self.write(_end_session, session_id)
+
+    async def list_sessions(self, client_id: str = "", limit: int = 10) -> list[dict]:
+        return await self.read(_list_sessions, client_id, limit)
+
+    async def count_sessions(self, client_id: str = "") -> int:
+        return await self.read(_count_sessions, client_id)
+
+    async def delete_session(self, session_id: str):
+        await self.write(_delete_session, session_id)
+
+    async def log_receipt(self, **receipt):
+        await self.write(_log_receipt, **receipt)
+
+    async def get_usage_summary(self, start_date: str | None = None, end_date: str | None = None) -> dict:
+        return await self.read(_get_usage_summary, start_date, end_date)
+
+
+def _settle(future: asyncio.Future, ok: bool, value):
+    if future.done():
+        return  # Caller was cancelled; the write still happened
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+db = AsyncDatabase()
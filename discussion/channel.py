@@ -0,0 +1,195 @@
+"""Per-session websocket plumbing.
+
+Input: a single reader task owns ``websocket.receive_text()`` for the
+lifetime of a session. Pings are answered and cancel requests flagged as soon
+as they arrive; every other command is queued for the engine. Streaming
+agents pick up user interjections from the queue between chunks without
+touching the socket, so nothing has to poll it with timeouts.
+
+Output: ``ChunkBuffer`` coalesces a response's text deltas into fewer
+``agent_chunk`` frames.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Commands that start agent generation and can therefore be cancelled
+GENERATION_ACTIONS = ("run_agent", "run_batch")
+
+
+class SessionChannel:
+    def __init__(self, websocket: WebSocket, tool_concurrency: int = 4):
+        self.websocket = websocket
+        # Caps concurrent tool calls (web/image searches) across all of the session's agents
+        self.tool_slots = asyncio.Semaphore(tool_concurrency)
+        # Search cache counters for this session, set up by the engine
+        self.search_stats: dict | None = None
+        self._commands: deque[dict] = deque()
+        self._available = asyncio.Event()
+        self._closed_exc: Exception | None = None
+        self._reader: asyncio.Task | None = None
+        # Generation commands are numbered on arrival; a cancel applies to every
+        # generation received before it, never to ones queued afterwards.
+        self._generation_seq = 0
+        self._cancelled_through = 0
+        self._active_seq = 0
+
+    def start(self):
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+
+    async def _read_loop(self):
+        try:
+            while True:
+                raw = await self.websocket.receive_text()
+                try:
+                    cmd = json.loads(raw)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring malformed command: {raw[:200]}")
+                    continue
+
+                action = cmd.get("action", "")
+                if action == "ping":
+                    await self._send({"type": "pong"})
+                elif action == "cancel":
+                    self._cancelled_through = self._generation_seq
+                else:
+                    if action in GENERATION_ACTIONS:
+                        self._generation_seq += 1
+                        cmd["_seq"] = self._generation_seq
+                    self._commands.append(cmd)
+                    self._available.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # WebSocketDisconnect and friends end the session
+            self._closed_exc = e
+            self._available.set()
+
+    async def _send(self, data: dict):
+        try:
+            await self.websocket.send_text(json.dumps(data))
+        except Exception:
+            pass
+
+    # ── engine-facing API ──
+
+    @property
+    def closed(self) -> bool:
+        """True once the client has disconnected."""
+        return self._closed_exc is not None
+
+    async def next_command(self) -> dict:
+        """Wait for the next queued command; re-raise the disconnect once input is exhausted."""
+        while not self._commands:
+            if self._closed_exc is not None:
+                raise self._closed_exc
+            self._available.clear()
+            await self._available.wait()
+        cmd = self._commands.popleft()
+        if "_seq" in cmd:
+            self._active_seq = cmd["_seq"]
+        return cmd
+
+    def take_interjections(self) -> list[str]:
+        """Remove and return queued user messages, leaving other commands in order."""
+        if not self._commands:
+            return []
+        messages = []
+        kept: deque[dict] = deque()
+        for cmd in self._commands:
+            if cmd.get("action") == "user_message":
+                content = cmd.get("message", "").strip()
+                if content:
+                    messages.append(content)
+            else:
+                kept.append(cmd)
+        self._commands = kept
+        return messages
+
+    @property
+    def cancel_requested(self) -> bool:
+        """True once the user cancelled the generation command being processed."""
+        return 0 < self._active_seq <= self._cancelled_through
+
+
+class ChunkBuffer:
+    """Coalesces one agent response's deltas into ``agent_chunk`` frames.
+
+    The first delta is sent immediately so time-to-first-token is unchanged.
+    After that, text is held until ``flush_bytes`` accumulate or ``flush_ms``
+    pass since the buffer started filling, whichever comes first. A
+    ``flush_ms`` of 0 disables coalescing.
+    """
+
+    def __init__(self, websocket: WebSocket, agent_name: str, agent_key: str,
+                 flush_ms: int = 30, flush_bytes: int = 512):
+        self.websocket = websocket
+        self.agent_name = agent_name
+        self.agent_key = agent_key
+        self.flush_window = flush_ms / 1000
+        self.flush_bytes = flush_bytes
+        self._parts: list[str] = []
+        self._size = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()  # keeps timer and inline flushes in order
+        self._pending: set[asyncio.Task] = set()
+        self.chunks = 0
+        self.frames = 0
+
+    async def add(self, text: str):
+        self.chunks += 1
+        self._parts.append(text)
+        self._size += len(text.encode())
+        if self.frames == 0 or self.flush_window <= 0 or self._size >= self.flush_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_window, self._flush_on_timer)
+
+    def _flush_on_timer(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        self._size = 0
+        self.frames += 1
+        async with self._lock:
+            try:
+                await self.websocket.send_text(json.dumps({
+                    "type": "agent_chunk",
+                    "agent": self.agent_name,
+                    "agent_key": self.agent_key,
+                    "chunk": text,
+                }))
+            except Exception:
+                pass
+
+    async def close(self):
+        """Send whatever is buffered and wait for in-flight timer flushes."""
+        await self.flush()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"chunks": self.chunks, "frames": self.frames}
@@ -0,0 +1,50 @@
+"""Cheap local check for whether an agent response was cut off.
+
+Used before falling back to The Curator: the provider's stop reason plus a few
+structural signals settle most responses without another LLM round trip.
+"""
+
+import re
+
+# Characters a finished response plausibly ends on (sentence ends, closing
+# quotes/brackets, markdown emphasis and table pipes)
+_TERMINATORS = set(".!?\"'”’)]*_|`")
+_DANGLING_LIST_MARKER = re.compile(r"([-*+•]|\d+[.)])")
+# Only endings that can't finish a sentence: a comma, or a lowercase connective
+# right after another word. Colons, dashes and one-letter words ("...go with
+# Plan A", "the answer is: a") end real responses too, so the Curator decides
+_TRAILING_CONNECTOR = re.compile(r"(?:,|(?<=\w)\s+(?:and|or|but|the|to|of|with))$")
+
+
+def assess_completeness(text: str, stop_reason: str = "") -> bool | None:
+    """Return True if complete, False if cut off, None if the Curator should decide."""
+    if stop_reason == "max_tokens":
+        return False
+
+    stripped = text.rstrip()
+    if not stripped:
+        return None
+
+    if stripped.count("```") % 2:
+        return False  # Unclosed code fence
+
+    last_line = stripped.rsplit("\n", 1)[-1].strip()
+    if _DANGLING_LIST_MARKER.fullmatch(last_line):
+        return False  # List item started but never written
+    if _TRAILING_CONNECTOR.search(stripped):
+        return False  # Stopped mid-clause
+
+    # Without a clean end_turn we can't rule out a provider-side cut
+    if stop_reason == "end_turn" and (stripped[-1] in _TERMINATORS or _ends_with_emoji(stripped)):
+        return True
+    return None
+
+
+def _ends_with_emoji(text: str) -> bool:
+    return ord(text[-1]) >= 0x2600
+
+
+def last_topic_hint(text: str, words: int = 12) -> str:
+    """The tail of a truncated response, used as the continuation cue."""
+    tail = text.split()[-words:]
+    return " ".join(tail) if tail else "their previous point"
@@ -0,0 +1,67 @@
+"""Content-addressed store for extracted file context.
+
+Uploads are keyed by the sha256 of their extracted text, so identical uploads
+share one blob and sessions reference it by hash instead of embedding it.
+Blobs live in SQLite (see ``database.blobs``); recently used ones are kept in
+an in-memory LRU bounded by total bytes.
+"""
+
+from collections import OrderedDict
+
+from database import db, blob_hash
+
+
+class ContextStore:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def put(self, text: str) -> str:
+        """Store ``text`` (once) and return its hash."""
+        key = blob_hash(text)
+        if key not in self._cache:
+            await db.put_blob(text)
+        self._remember(key, text)
+        return key
+
+    async def get(self, key: str) -> str | None:
+        if not key:
+            return None
+        text = self._cache.get(key)
+        if text is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return text
+        self.misses += 1
+        text = await db.get_blob(key)
+        if text is not None:
+            self._remember(key, text)
+        return text
+
+    def _remember(self, key: str, text: str):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return
+        size = len(text.encode())
+        if size > self.max_bytes:
+            return  # Too big to cache; always served from the database
+        self._cache[key] = text
+        self._sizes[key] = size
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old, _ = self._cache.popitem(last=False)
+            self._bytes -= self._sizes.pop(old)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,11 +1,18 @@
 import json
+import time
 import asyncio
 import logging
+from dataclasses import replace
 from fastapi import WebSocket
+import config
 from agents.registry import AgentRegistry
-from agents.providers import Usage
+from agents.providers import Usage, CACHEABLE
+from .channel import SessionChannel, ChunkBuffer
+from .completeness import assess_completeness, last_topic_hint
+from .pipeline import TurnPipeline
+from .search import execute_search, format_evidence_digest, prefetch_queries, search_cache
 from .models import Discussion, Message
-from database import log_receipt, update_session_state, end_session, estimate_cost
+from database import db, estimate_cost, SESSION_LEASE_TTL, SessionLeaseLost
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +22,46 @@ class DiscussionEngine:
 
     def __init__(self, registry: AgentRegistry):
         self.registry = registry
+        self.stream_stats = {"responses": 0, "chunks": 0, "frames": 0}
+        self.compaction_stats = {"background_runs": 0, "seconds_total": 0.0,
+                                 "seconds_waited": 0.0, "seconds_saved": 0.0}
+        self.curator_stats = {"checks": 0, "local_complete": 0, "local_incomplete": 0, "llm_calls": 0}
+        self.prefetch_stats = {"sessions": 0, "digests": 0, "empty": 0, "prompts_with_evidence": 0,
+                               "not_ready": 0, "seconds_waited": 0.0}
+        self.pipeline_stats: dict = {}
+
+    def stats(self) -> dict:
+        """Aggregate engine metrics for the admin endpoint."""
+        responses = self.stream_stats["responses"]
+        return {
+            "streaming": {
+                **self.stream_stats,
+                "frames_per_response": round(self.stream_stats["frames"] / responses, 2) if responses else 0.0,
+                "chunks_per_frame": (
+                    round(self.stream_stats["chunks"] / self.stream_stats["frames"], 2)
+                    if self.stream_stats["frames"] else 0.0
+                ),
+            },
+            "background_compaction": {
+                k: round(v, 3) if isinstance(v, float) else v
+                for k, v in self.compaction_stats.items()
+            },
+            "curator": {
+                **self.curator_stats,
+                "skip_rate": (
+                    round(1 - self.curator_stats["llm_calls"] / self.curator_stats["checks"], 3)
+                    if self.curator_stats["checks"] else 0.0
+                ),
+            },
+            "search_prefetch": {
+                k: round(v, 3) if isinstance(v, float) else v
+                for k, v in self.prefetch_stats.items()
+            },
+            "post_turn_pipeline": {
+                k: round(v, 3) if isinstance(v, float) else v
+                for k, v in self.pipeline_stats.items()
+            },
+        }
 
     async def run_session(self, websocket: WebSocket, topic: str,
                           agent_keys: list[str] | None = None,
@@ -25,9 +72,6 @@ class DiscussionEngine:
                           viewpoints: list[str] | None = None):
         """Run an interactive session, processing commands from the frontend."""
 
-        # Fixed viewpoints for sentiment analysis (user-provided or auto-generated from round 1)
-        fixed_viewpoints = list(viewpoints) if viewpoints and len(viewpoints) == 2 and all(v.strip() for v in viewpoints) else []
-
         if prior_discussion:
             discussion = prior_discussion
             round_num = max((m.round_num for m in discussion.messages), default=0)
@@ -42,145 +86,223 @@ class DiscussionEngine:
                 "round": round_num,
             })
 
-        # Send initial ready signal
-        await self._send(websocket, {
-            "type": "ready",
-            "round": round_num,
-        })
+        # Fixed viewpoints for sentiment analysis (user-provided or auto-generated from round 1).
+        # They live on the discussion so a resumed session keeps the auto-generated pair.
+        if viewpoints and len(viewpoints) == 2 and all(v.strip() for v in viewpoints):
+            discussion.viewpoints = list(viewpoints)
+        fixed_viewpoints = discussion.viewpoints
+
+        # One reader task owns the socket's receive side for the whole session
+        channel = SessionChannel(websocket, config.TOOL_CALL_CONCURRENCY)
+        search_session = session_id or f"unsaved-{id(channel)}"
+        channel.search_stats = search_cache.open_session(search_session)
+        channel.start()
+
+        # Warm the search cache with the topic searches round 1 would start with
+        if round_num == 1 and not discussion.messages and self._prefetch_enabled(api_keys):
+            discussion.evidence_task = asyncio.create_task(
+                self._prefetch_evidence(topic, api_keys, channel.search_stats))
+
+        # Persistence and Curator checks run behind the conversation, in order
+        pipeline = TurnPipeline(config.POST_TURN_BACKLOG, stats=self.pipeline_stats)
+        pipeline.start()
+
+        # Saves renew the session lease too, but an idle session must keep it
+        lease_task = asyncio.create_task(self._keep_lease(websocket, session_id)) if session_id else None
+
+        # Compaction started speculatively on new_round; agents await it only if still running
+        compaction_task: asyncio.Task | None = None
+        context_limit = int((api_keys or {}).get("context_limit", 0))
 
-        # On reconnect, run Curator check on the last message for completeness
-        if prior_discussion and discussion.messages:
-            last_msg = discussion.messages[-1]
-            if last_msg.agent_name != "user":
-                for k, a in self.registry.agents.items():
-                    if a.name == last_msg.agent_name and k != "sentiment_analyst":
-                        await self._run_curator_check(
-                            websocket, a, discussion, topic,
-                            round_num, file_context, api_keys, session_id
+        try:
+            # Send initial ready signal
+            await self._send(websocket, {
+                "type": "ready",
+                "round": round_num,
+            })
+
+            # On reconnect, run Curator check on the last message for completeness
+            if prior_discussion and discussion.messages:
+                last_msg = discussion.messages[-1]
+                if last_msg.agent_name != "user":
+                    for k, a in self.registry.agents.items():
+                        if a.name == last_msg.agent_name and k != "sentiment_analyst":
+                            await self._queue_curator_check(
+                                pipeline, channel, websocket, a, last_msg, topic, api_keys
+                            )
+                            break
+
+            # Command loop — frontend drives the flow
+            while True:
+                cmd = await channel.next_command()
+                action = cmd.get("action", "")
+
+                if action == "run_agent":
+                    agent_key = cmd.get("agent_key", "")
+                    continue_from = cmd.get("continue_from", "")
+                    agent = self.registry.get_agent(agent_key) if agent_key in self.registry.agents else None
+                    if not agent:
+                        await self._send(websocket, {"type": "error", "message": f"Unknown agent: {agent_key}"})
+                        await self._send(websocket, {"type": "ready", "round": round_num})
+                        continue
+
+                    live_keys = self._live_keys(api_keys, cmd)
+                    context_limit = int(live_keys.get("context_limit", 0))
+                    await self._await_compaction(compaction_task)
+                    compaction_task = None
+
+                    usage = await self._run_single_agent(websocket, agent, discussion, topic,
+                                                         round_num, file_context, live_keys, session_id,
+                                                         continue_from=continue_from,
+                                                         agent_key=agent_key,
+                                                         fixed_viewpoints=fixed_viewpoints,
+                                                         channel=channel,
+                                                         pipeline=pipeline)
+
+                    # Queue a curator check on the agent's response (skip for sentiment analyst
+                    # and for responses the user cut short on purpose)
+                    if agent_key != "sentiment_analyst" and not channel.cancel_requested:
+                        await self._queue_curator_check(
+                            pipeline, channel, websocket, agent,
+                            discussion.latest_message(agent.name), topic, api_keys,
+                            stop_reason=usage.stop_reason,
                         )
-                        break
 
-        # Command loop — frontend drives the flow
-        while True:
-            raw = await websocket.receive_text()
-            cmd = json.loads(raw)
-            action = cmd.get("action", "")
-
-            if action == "ping":
-                await self._send(websocket, {"type": "pong"})
-
-            elif action == "run_agent":
-                agent_key = cmd.get("agent_key", "")
-                continue_from = cmd.get("continue_from", "")
-                agent = self.registry.get_agent(agent_key) if agent_key in self.registry.agents else None
-                if not agent:
-                    await self._send(websocket, {"type": "error", "message": f"Unknown agent: {agent_key}"})
                     await self._send(websocket, {"type": "ready", "round": round_num})
-                    continue
-
-                # Apply per-command overrides for live settings
-                live_keys = dict(api_keys or {})
-                if "word_limit" in cmd:
-                    live_keys["word_limit"] = cmd["word_limit"]
-                if "tone" in cmd:
-                    live_keys["tone"] = cmd["tone"]
-                if "context_limit" in cmd:
-                    live_keys["context_limit"] = cmd["context_limit"]
-
-                await self._run_single_agent(websocket, agent, discussion, topic,
-                                             round_num, file_context, live_keys, session_id,
-                                             continue_from=continue_from,
-                                             agent_key=agent_key,
-                                             fixed_viewpoints=fixed_viewpoints)
-
-                # Run curator check on the agent's response (skip for sentiment analyst)
-                if agent_key != "sentiment_analyst":
-                    await self._run_curator_check(
-                        websocket, agent, discussion, topic,
-                        round_num, file_context, api_keys, session_id
-                    )
-
-                await self._send(websocket, {"type": "ready", "round": round_num})
-
-            elif action == "run_batch":
-                keys = cmd.get("agent_keys", [])
-                for key in keys:
-                    agent = self.registry.get_agent(key) if key in self.registry.agents else None
-                    if agent:
-                        await self._run_single_agent(websocket, agent, discussion, topic,
-                                                     round_num, file_context, api_keys, session_id)
-                await self._send(websocket, {"type": "ready", "round": round_num})
-
-            elif action == "user_message":
-                content = cmd.get("message", "").strip()
-                if content:
-                    discussion.add_message(Message(
-                        agent_name="user",
-                        content=content,
-                        round_num=round_num,
-                    ))
+
+                elif action == "run_batch":
+                    keys = [k for k in cmd.get("agent_keys", []) if k in self.registry.agents]
+                    live_keys = self._live_keys(api_keys, cmd)
+                    context_limit = int(live_keys.get("context_limit", 0))
+                    await self._await_compaction(compaction_task)
+                    compaction_task = None
+                    if cmd.get("parallel"):
+                        await self._run_parallel_round(websocket, keys, discussion, topic,
+                                                       round_num, file_context, live_keys, session_id,
+                                                       max_concurrency=int(cmd.get("max_concurrency", 0)),
+                                                       fixed_viewpoints=fixed_viewpoints,
+                                                       channel=channel,
+                                                       pipeline=pipeline)
+                    else:
+                        for key in keys:
+                            if channel.cancel_requested:
+                                break
+                            await self._run_single_agent(websocket, self.registry.get_agent(key), discussion, topic,
+                                                         round_num, file_context, live_keys, session_id,
+                                                         agent_key=key,
+                                                         fixed_viewpoints=fixed_viewpoints,
+                                                         channel=channel,
+                                                         pipeline=pipeline)
+                    await self._send(websocket, {"type": "ready", "round": round_num})
+
+                elif action == "user_message":
+                    content = cmd.get("message", "").strip()
+                    if content:
+                        discussion.add_message(Message(
+                            agent_name="user",
+                            content=content,
+                            round_num=round_num,
+                        ))
+                        await self._send(websocket, {
+                            "type": "user_message",
+                            "content": content,
+                            "round": round_num,
+                        })
+                        await self._queue_persist(pipeline, session_id, discussion, round_num)
+                    await self._send(websocket, {"type": "ready", "round": round_num})
+
+                elif action == "new_round":
+                    round_num += 1
                     await self._send(websocket, {
-                        "type": "user_message",
-                        "content": content,
+                        "type": "round_start",
                         "round": round_num,
                     })
-                    if session_id:
-                        update_session_state(session_id, discussion.export(), round_num)
-                await self._send(websocket, {"type": "ready", "round": round_num})
-
-            elif action == "new_round":
-                round_num += 1
-                await self._send(websocket, {
-                    "type": "round_start",
-                    "round": round_num,
-                })
-                if session_id:
-                    update_session_state(session_id, discussion.export(), round_num)
-                await self._send(websocket, {"type": "ready", "round": round_num})
+                    if "context_limit" in cmd:
+                        context_limit = int(cmd["context_limit"] or 0)
+                    if context_limit > 0 and compaction_task is None:
+                        # The previous round just closed: summarize it while the user gets ready
+                        compaction_task = asyncio.create_task(self._timed_compaction(
+                            discussion, round_num, context_limit,
+                            {**(api_keys or {}), "context_limit": context_limit},
+                        ))
+                    await self._queue_persist(pipeline, session_id, discussion, round_num)
+                    await self._send(websocket, {"type": "ready", "round": round_num})
 
-            elif action == "end":
-                if session_id:
-                    end_session(session_id)
-                await self._send(websocket, {
-                    "type": "discussion_end",
-                    "export": discussion.export(),
-                })
-                break
+                elif action == "end":
+                    await pipeline.flush()
+                    if session_id:
+                        await db.end_session(session_id)
+                    await self._send(websocket, {
+                        "type": "discussion_end",
+                        "export": discussion.export(),
+                    })
+                    break
 
-            elif action == "get_export":
-                await self._send(websocket, {
-                    "type": "export_data",
-                    "export": discussion.export(),
-                })
+                elif action == "get_export":
+                    await self._send(websocket, {
+                        "type": "export_data",
+                        "export": discussion.export(),
+                    })
 
-            else:
-                await self._send(websocket, {"type": "error", "message": f"Unknown action: {action}"})
-                await self._send(websocket, {"type": "ready", "round": round_num})
+                else:
+                    await self._send(websocket, {"type": "error", "message": f"Unknown action: {action}"})
+                    await self._send(websocket, {"type": "ready", "round": round_num})
+        finally:
+            if compaction_task and not compaction_task.done():
+                compaction_task.cancel()
+            if discussion.evidence_task and not discussion.evidence_task.done():
+                discussion.evidence_task.cancel()
+            if lease_task:
+                lease_task.cancel()
+            # Persist whatever is still queued, even if the client is gone
+            await pipeline.close()
+            await channel.close()
+            searches = search_cache.close_session(search_session)
+            if searches["misses"] or searches["hit_rate"]:
+                logger.info(f"Session {search_session} search cache: {searches}")
 
     async def _run_single_agent(self, websocket: WebSocket, agent, discussion: Discussion,
                                  topic: str, round_num: int, file_context: str,
                                  api_keys: dict | None = None, session_id: str = "",
                                  continue_from: str = "",
                                  agent_key: str = "",
-                                 fixed_viewpoints: list[str] | None = None):
-        """Stream a single agent's response."""
+                                 fixed_viewpoints: list[str] | None = None,
+                                 snapshot: Discussion | None = None,
+                                 channel: SessionChannel | None = None,
+                                 pipeline: TurnPipeline | None = None) -> Usage:
+        """Stream a single agent's response and return its usage.
+
+        When ``snapshot`` is given the prompt is built from it instead of the
+        live discussion, so concurrent agents all see the same transcript.
+        With a ``channel``, user interjections are applied between chunks and
+        a cancel or a disconnect stops the stream, keeping what was generated
+        so far.
+        """
+        source = snapshot or discussion
         word_limit = int((api_keys or {}).get("word_limit", 0))
         tone = (api_keys or {}).get("tone", "")
         context_limit = int((api_keys or {}).get("context_limit", 0))
 
-        # Compact context if needed (before building messages)
-        if context_limit > 0 and round_num > 1:
+        # Compact context if needed (before building messages). A snapshot was
+        # compacted once for the whole parallel round; concurrent panelists
+        # must not each summarize the same rounds again.
+        if context_limit > 0 and round_num > 1 and snapshot is None:
             await self._maybe_compact_context(
-                discussion, round_num, context_limit, api_keys
+                source, round_num, context_limit, api_keys
             )
 
-        messages = self._build_messages(discussion, topic, round_num, file_context,
+        evidence = ""
+        if round_num == 1 and discussion.evidence_task is not None:
+            evidence = await self._await_evidence(discussion.evidence_task)
+
+        messages = self._build_messages(source, topic, round_num, file_context,
                                         word_limit=word_limit, tone=tone,
                                         continue_from=continue_from,
                                         continue_agent=agent.name if continue_from else "",
                                         agent_key=agent_key,
                                         fixed_viewpoints=fixed_viewpoints,
-                                        context_limit=context_limit)
+                                        context_limit=context_limit,
+                                        evidence=evidence)
 
         if not agent_key:
             agent_key = next((k for k, a in self.registry.agents.items() if a is agent), "")
@@ -196,17 +318,38 @@ class DiscussionEngine:
 
         full_response = ""
         usage = Usage()
-        async for item in agent.stream_response(messages, api_keys=api_keys):
-            if isinstance(item, Usage):
-                usage = item
-            else:
-                full_response += item
-                await self._send(websocket, {
-                    "type": "agent_chunk",
-                    "agent": agent.name,
-                    "chunk": item,
-                })
-                await self._drain_user_messages(websocket, discussion, round_num)
+        cancelled = False
+        settings = api_keys or {}
+        buffer = ChunkBuffer(
+            websocket, agent.name, agent_key,
+            flush_ms=int(settings.get("chunk_flush_ms", config.CHUNK_FLUSH_MS)),
+            flush_bytes=int(settings.get("chunk_flush_bytes", config.CHUNK_FLUSH_BYTES)),
+        )
+        stream = agent.stream_response(messages, api_keys=api_keys,
+                                       tool_slots=channel.tool_slots if channel else None,
+                                       search_stats=channel.search_stats if channel else None)
+        try:
+            async for item in stream:
+                if isinstance(item, Usage):
+                    usage = item
+                else:
+                    full_response += item
+                    await buffer.add(item)
+                    if channel:
+                        await self._apply_interjections(websocket, channel, discussion, round_num)
+                        # Nobody is listening once the client disconnects:
+                        # stop paying for tokens, as a cancel would
+                        if channel.cancel_requested or channel.closed:
+                            cancelled = True
+                            break
+        finally:
+            # Closes the provider stream promptly when we stop early
+            await stream.aclose()
+            await buffer.close()
+
+        self.stream_stats["responses"] += 1
+        self.stream_stats["chunks"] += buffer.chunks
+        self.stream_stats["frames"] += buffer.frames
 
         discussion.add_message(Message(
             agent_name=agent.name,
@@ -214,11 +357,16 @@ class DiscussionEngine:
             round_num=round_num,
         ))
 
-        await self._send(websocket, {
+        done = {
             "type": "agent_done",
             "agent": agent.name,
+            "agent_key": agent_key,
             "usage": usage.to_dict(),
-        })
+            "stream": buffer.stats(),
+        }
+        if cancelled:
+            done["cancelled"] = True
+        await self._send(websocket, done)
 
         # If this is the Sentiment Analyst, extract chart data from the response
         if agent_key == "sentiment_analyst":
@@ -229,8 +377,9 @@ class DiscussionEngine:
         # Persist receipt and session state
         if session_id:
             model = (api_keys or {}).get("model", "")
-            cost = estimate_cost(model, usage.input_tokens, usage.output_tokens)
-            log_receipt(
+            cost = estimate_cost(model, usage.input_tokens, usage.output_tokens,
+                                 usage.cache_read_tokens, usage.cache_write_tokens)
+            await self._queue_persist(pipeline, session_id, discussion, round_num, receipt=dict(
                 session_id=session_id,
                 agent_name=agent.name,
                 round_num=round_num,
@@ -239,26 +388,171 @@ class DiscussionEngine:
                 estimated_cost=cost,
                 provider=(api_keys or {}).get("provider", ""),
                 model=model,
-            )
-            update_session_state(session_id, discussion.export(), round_num)
+                cache_read_tokens=usage.cache_read_tokens,
+                cache_write_tokens=usage.cache_write_tokens,
+            ))
 
-    # ── Curator: completeness check ──
+        return usage
 
-    async def _run_curator_check(self, websocket: WebSocket, agent, discussion: Discussion,
-                                  topic: str, round_num: int, file_context: str,
-                                  api_keys: dict | None = None, session_id: str = ""):
-        """Run The Curator silently to check if the last agent response was complete."""
-        curator = self.registry.get_observer("the_curator")
-        if not curator:
+    # ── Parallel rounds ──
+
+    # Agents that react to the whole round, so they run after the panel finishes
+    ROUND_CLOSERS = ("the_mediator", "the_judge", "sentiment_analyst")
+
+    async def _run_parallel_round(self, websocket: WebSocket, keys: list[str],
+                                  discussion: Discussion, topic: str, round_num: int,
+                                  file_context: str, api_keys: dict | None = None,
+                                  session_id: str = "", max_concurrency: int = 0,
+                                  fixed_viewpoints: list[str] | None = None,
+                                  channel: SessionChannel | None = None,
+                                  pipeline: TurnPipeline | None = None):
+        """Run panelists concurrently against one transcript snapshot, then the closers in order.
+
+        Chunks from concurrent agents are interleaved on the websocket; every
+        frame carries ``agent_key`` so the client can demultiplex them. The
+        bundled UI runs batches sequentially; ``parallel`` is for API clients.
+        """
+        panel = [k for k in keys if k not in self.ROUND_CLOSERS]
+        closers = [k for k in keys if k in self.ROUND_CLOSERS]
+        limit = max_concurrency if max_concurrency > 0 else config.PARALLEL_AGENT_LIMIT
+
+        # Compact once up front so the snapshot carries the summary for every panelist
+        context_limit = int((api_keys or {}).get("context_limit", 0))
+        if context_limit > 0 and round_num > 1:
+            await self._maybe_compact_context(discussion, round_num, context_limit, api_keys)
+        # Own lists, so nothing a panelist does to the snapshot reaches the live discussion
+        snapshot = replace(discussion, messages=list(discussion.messages),
+                           summaries=[dict(s) for s in discussion.summaries])
+
+        semaphore = asyncio.Semaphore(limit)
+
+        async def run_one(key: str):
+            async with semaphore:
+                await self._run_single_agent(websocket, self.registry.get_agent(key), discussion, topic,
+                                             round_num, file_context, api_keys, session_id,
+                                             agent_key=key,
+                                             fixed_viewpoints=fixed_viewpoints,
+                                             snapshot=snapshot,
+                                             channel=channel,
+                                             pipeline=pipeline)
+
+        results = await asyncio.gather(*(run_one(k) for k in panel), return_exceptions=True)
+        for key, result in zip(panel, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Parallel agent {key} failed: {result}")
+                await self._send(websocket, {"type": "error", "message": f"{key} failed: {result}"})
+                # Lets the client close the bubble it may have opened for this key
+                await self._send(websocket, {
+                    "type": "agent_done",
+                    "agent": self.registry.get_agent(key).name,
+                    "agent_key": key,
+                    "failed": True,
+                })
+
+        for key in closers:
+            if channel and channel.cancel_requested:
+                break
+            await self._run_single_agent(websocket, self.registry.get_agent(key), discussion, topic,
+                                         round_num, file_context, api_keys, session_id,
+                                         agent_key=key,
+                                         fixed_viewpoints=fixed_viewpoints,
+                                         channel=channel,
+                                         pipeline=pipeline)
+
+    async def _keep_lease(self, websocket: WebSocket, session_id: str):
+        """Renew this worker's session lease until cancelled.
+
+        If another worker took the session over, this connection must not
+        write to it again: tell the client and close the socket, which ends
+        the session loop.
+        """
+        while True:
+            await asyncio.sleep(SESSION_LEASE_TTL / 3)
+            try:
+                await db.renew_session(session_id)
+            except SessionLeaseLost as e:
+                logger.error(str(e))
+                await self._send(websocket, {
+                    "type": "error",
+                    "message": "This session was opened in another window",
+                })
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+                return
+            except Exception as e:
+                logger.warning(f"Session lease renewal failed: {e}")
+
+    # ── Post-turn work ──
+
+    async def _queue_persist(self, pipeline: TurnPipeline | None, session_id: str,
+                             discussion: Discussion, round_num: int, receipt: dict | None = None):
+        """Write a usage receipt (optional) and the session state off the event loop.
+
+        Only messages added since the last save are appended, and the state
+        header is rewritten only when compaction changed it. Both are read
+        when the job runs, so a backlog of writes persists the latest discussion.
+        """
+        if not session_id:
             return
 
-        # Get the last message (should be the agent's response we just finished)
-        if not discussion.messages:
+        async def job():
+            if receipt:
+                await db.log_receipt(**receipt)
+            first = discussion.saved_messages
+            messages = [m.to_dict() for m in discussion.messages[first:]]
+            state_key = discussion.state_key
+            state = discussion.export_state() if state_key != discussion.saved_state_key else None
+            await db.save_discussion(session_id, first, messages, round_num, state)
+            discussion.saved_messages = first + len(messages)
+            discussion.saved_state_key = state_key
+
+        if pipeline:
+            await pipeline.submit("persist", job)
+        else:
+            await job()
+
+    async def _queue_curator_check(self, pipeline: TurnPipeline, channel: SessionChannel,
+                                   websocket: WebSocket, agent, message: Message | None,
+                                   topic: str, api_keys: dict | None = None, stop_reason: str = ""):
+        """Check if an agent response was complete, requeueing the agent if not.
+
+        The provider's stop reason and local structural signals decide most
+        cases, inline, so a requeue reaches the client before the following
+        ``ready`` (which starts the next speaker). Only the ambiguous cases
+        consult The Curator, silently and on the pipeline.
+        """
+        if message is None or message.agent_name == "user":
             return
-        last_msg = discussion.messages[-1]
-        if last_msg.agent_name == "user":
+
+        self.curator_stats["checks"] += 1
+        verdict = assess_completeness(message.content, stop_reason)
+        if verdict is True:
+            self.curator_stats["local_complete"] += 1
+            return
+        if verdict is False:
+            self.curator_stats["local_incomplete"] += 1
+            await self._send_requeue(websocket, agent, last_topic_hint(message.content))
             return
 
+        async def job():
+            if channel.closed:
+                return  # Nobody left to requeue for
+            await self._run_curator_check(websocket, agent, message, topic, api_keys)
+
+        await pipeline.submit("curator", job)
+
+    # ── Curator: completeness check ──
+
+    async def _run_curator_check(self, websocket: WebSocket, agent, last_msg: Message,
+                                  topic: str, api_keys: dict | None = None):
+        """Ask The Curator whether an ambiguous response was cut off."""
+        curator = self.registry.get_observer("the_curator")
+        if not curator:
+            return
+        self.curator_stats["llm_calls"] += 1
+
         messages = [{
             "role": "user",
             "content": (
@@ -280,23 +574,26 @@ class DiscussionEngine:
             result = json.loads(cleaned)
 
             if not result.get("complete", True):
-                last_topic = result.get("last_topic", "their previous point")
-                agent_key = next((k for k, a in self.registry.agents.items() if a is agent), "")
-                await self._send(websocket, {
-                    "type": "curator_requeue",
-                    "agent_key": agent_key,
-                    "agent_name": agent.name,
-                    "avatar": agent.avatar,
-                    "color": agent.color,
-                    "last_topic": last_topic,
-                })
-                logger.info(f"Curator flagged {agent.name} as incomplete: {last_topic}")
+                await self._send_requeue(websocket, agent, result.get("last_topic", "their previous point"))
 
         except json.JSONDecodeError:
             logger.warning(f"Curator returned invalid JSON: {full_response[:200]}")
         except Exception as e:
             logger.warning(f"Curator check failed: {e}")
 
+    async def _send_requeue(self, websocket: WebSocket, agent, last_topic: str):
+        """Ask the frontend to queue a continuation for an incomplete response."""
+        agent_key = next((k for k, a in self.registry.agents.items() if a is agent), "")
+        await self._send(websocket, {
+            "type": "curator_requeue",
+            "agent_key": agent_key,
+            "agent_name": agent.name,
+            "avatar": agent.avatar,
+            "color": agent.color,
+            "last_topic": last_topic,
+        })
+        logger.info(f"Curator flagged {agent.name} as incomplete: {last_topic}")
+
     # ── Sentiment Data Extraction ──
 
     async def _extract_sentiment_data(self, websocket: WebSocket,
@@ -345,87 +642,190 @@ class DiscussionEngine:
     async def _maybe_compact_context(self, discussion: Discussion,
                                       current_round: int, context_limit: int,
                                       api_keys: dict | None = None):
-        """Compact older rounds into a summary if the transcript exceeds the token limit."""
+        """Keep rolling summaries of closed rounds once the transcript exceeds the token limit.
+
+        Only rounds not yet covered by ``discussion.summaries`` are summarized.
+        When the summaries themselves outgrow their budget, the oldest two are
+        merged, so older history is compressed hierarchically. Summaries live on
+        the Discussion and are exported with it, so resumed sessions start warm.
+        """
         if current_round <= 1:
             return
 
-        # Check if we already have a valid cached summary
-        if (discussion._compacted_summary
-                and discussion._compacted_through_round >= current_round - 1
-                and discussion._compacted_msg_count == len(discussion.messages)):
-            return
+        first_new = discussion.summarized_through + 1
+        if first_new > current_round - 1:
+            return  # Every closed round is already summarized
 
         # Estimate full transcript tokens
-        full_transcript = discussion.get_transcript()
-        estimated_tokens = self._estimate_tokens(full_transcript)
-
+        estimated_tokens = self._estimate_tokens(discussion.get_transcript())
         if estimated_tokens <= context_limit:
             return  # Under limit, no compaction needed
 
-        # Get the older rounds to summarize
-        older_text = discussion.get_older_rounds_transcript(current_round)
-        if not older_text.strip():
+        summary_agent = self._get_summary_agent()
+        if not summary_agent:
+            return
+
+        new_text = discussion.get_rounds_transcript(first_new, current_round - 1)
+        if not new_text.strip():
             return
 
         logger.info(
             f"Context compaction: ~{estimated_tokens} tokens exceeds {context_limit} limit. "
-            f"Summarizing rounds 1-{current_round - 1}."
+            f"Summarizing rounds {first_new}-{current_round - 1}."
         )
 
-        # Use the Curator agent (or any available agent) for summarization
-        # We create a one-shot summarization request
-        summary_agent = self.registry.get_observer("the_curator")
-        if not summary_agent:
-            # Fallback: use any available agent
-            for agent in self.registry.agents.values():
-                summary_agent = agent
-                break
-        if not summary_agent:
-            return
-
         target_length = max(500, context_limit // 4)
 
-        summary_messages = [{
-            "role": "user",
-            "content": (
-                "You are a discussion summarizer. Condense the following multi-round discussion "
-                "into a structured summary that preserves ALL essential information.\n\n"
+        try:
+            summary = await self._summarize(summary_agent, api_keys, (
+                "You are a discussion summarizer. Condense the following discussion "
+                "round(s) into a structured summary that preserves ALL essential information.\n\n"
                 f"TARGET LENGTH: approximately {target_length // 4} words.\n\n"
                 "YOUR SUMMARY MUST INCLUDE:\n"
                 "1. **Key positions**: For EACH panelist who spoke, state their core argument "
                 "and stance in 1-2 sentences. Use their names.\n"
                 "2. **Points of agreement**: What the group largely agrees on.\n"
                 "3. **Points of contention**: The main disagreements that remain unresolved.\n"
-                "4. **Evolution**: How positions shifted across rounds (if applicable).\n"
-                "5. **The Judge's verdict**: If The Judge spoke, summarize their evaluation and directives.\n"
-                "6. **User instructions**: If the user interjected, preserve their exact requests.\n\n"
+                "4. **The Judge's verdict**: If The Judge spoke, summarize their evaluation and directives.\n"
+                "5. **User instructions**: If the user interjected, preserve their exact requests.\n\n"
                 "DO NOT add commentary or analysis. Just compress the information faithfully.\n"
                 "DO NOT use bullet points excessively — write dense paragraphs.\n\n"
-                f"DISCUSSION TO SUMMARIZE:\n{older_text}"
-            ),
-        }]
+                f"DISCUSSION TO SUMMARIZE:\nTopic: {discussion.topic}\n{new_text}"
+            ))
+            if not summary:
+                return
+            discussion.summaries.append({"first": first_new, "last": current_round - 1, "text": summary})
+            logger.info(
+                f"Context compacted: {self._estimate_tokens(new_text)} → "
+                f"{self._estimate_tokens(summary)} tokens"
+            )
 
-        try:
-            summary_response = ""
-            async for item in summary_agent.stream_response(summary_messages, api_keys=api_keys):
-                if isinstance(item, Usage):
-                    pass
-                else:
-                    summary_response += item
-
-            if summary_response.strip():
-                discussion._compacted_summary = summary_response.strip()
-                discussion._compacted_through_round = current_round - 1
-                discussion._compacted_msg_count = len(discussion.messages)
-                logger.info(
-                    f"Context compacted: {self._estimate_tokens(older_text)} → "
-                    f"{self._estimate_tokens(summary_response)} tokens"
-                )
+            # Merge the oldest summaries while the rolling summary is over budget
+            while (len(discussion.summaries) > 1
+                   and self._estimate_tokens(discussion.get_compacted_summary()) > target_length):
+                older, newer = discussion.summaries[0], discussion.summaries[1]
+                merged = await self._summarize(summary_agent, api_keys, (
+                    "You are a discussion summarizer. Merge these two consecutive summaries of a "
+                    "multi-round discussion into ONE structured summary covering both periods.\n\n"
+                    f"TARGET LENGTH: approximately {target_length // 8} words.\n\n"
+                    "Preserve each panelist's core position, points of agreement and contention, "
+                    "The Judge's latest directives, and the user's exact requests. "
+                    "Describe how positions EVOLVED from the earlier to the later period.\n"
+                    "DO NOT add commentary. Write dense paragraphs.\n\n"
+                    f"EARLIER (rounds {older['first']}-{older['last']}):\n{older['text']}\n\n"
+                    f"LATER (rounds {newer['first']}-{newer['last']}):\n{newer['text']}"
+                ))
+                if not merged:
+                    break
+                discussion.summaries[0:2] = [{"first": older["first"], "last": newer["last"], "text": merged}]
         except Exception as e:
             logger.warning(f"Context compaction failed: {e}")
 
+    @staticmethod
+    def _prefetch_enabled(api_keys: dict | None) -> bool:
+        settings = api_keys or {}
+        if not (settings.get("brave_api_key") or config.BRAVE_API_KEY):
+            return False
+        return bool(settings.get("search_prefetch", config.SEARCH_PREFETCH))
+
+    async def _prefetch_evidence(self, topic: str, api_keys: dict | None,
+                                 search_stats: dict | None = None) -> str:
+        """Run the topic searches through the shared cache; returns an evidence digest."""
+        self.prefetch_stats["sessions"] += 1
+        brave_key = (api_keys or {}).get("brave_api_key", "") or config.BRAVE_API_KEY
+
+        async def one(query: str) -> list[dict]:
+            try:
+                return await asyncio.wait_for(
+                    execute_search(query, brave_api_key=brave_key, session_stats=search_stats),
+                    config.TOOL_CALL_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                return []
+
+        results = await asyncio.gather(*(one(q) for q in prefetch_queries(topic, config.SEARCH_PREFETCH_QUERIES)))
+        digest = format_evidence_digest(results)
+        self.prefetch_stats["digests" if digest else "empty"] += 1
+        return digest
+
+    async def _await_evidence(self, task: asyncio.Task) -> str:
+        """The prefetched digest, or "" if it failed or isn't ready soon.
+
+        Brave's rate limit is shared by every session, so under load the
+        searches can take many seconds; the agent waits at most
+        SEARCH_PREFETCH_WAIT_S for them rather than delaying its first token.
+        """
+        start = time.monotonic()
+        await asyncio.wait({task}, timeout=config.SEARCH_PREFETCH_WAIT_S)
+        self.prefetch_stats["seconds_waited"] += time.monotonic() - start
+        if not task.done():
+            self.prefetch_stats["not_ready"] += 1
+            return ""
+        try:
+            evidence = task.result()
+        except (Exception, asyncio.CancelledError) as e:
+            logger.warning(f"Topic search prefetch failed: {e!r}")
+            return ""
+        if evidence:
+            self.prefetch_stats["prompts_with_evidence"] += 1
+        return evidence
+
+    async def _timed_compaction(self, discussion: Discussion, current_round: int,
+                                context_limit: int, api_keys: dict | None = None) -> float:
+        """Run compaction in the background; returns how long it took."""
+        start = time.monotonic()
+        await self._maybe_compact_context(discussion, current_round, context_limit, api_keys)
+        return time.monotonic() - start
+
+    async def _await_compaction(self, task: asyncio.Task | None):
+        """Wait for a background compaction (if any) and record critical-path time saved."""
+        if task is None:
+            return
+        waited_from = time.monotonic()
+        try:
+            duration = await task
+        except Exception as e:
+            logger.warning(f"Background compaction failed: {e}")
+            return
+        waited = time.monotonic() - waited_from
+        stats = self.compaction_stats
+        stats["background_runs"] += 1
+        stats["seconds_total"] += duration
+        stats["seconds_waited"] += waited
+        stats["seconds_saved"] += max(0.0, duration - waited)
+        if duration > 0.05:
+            logger.info(f"Background compaction: {duration:.2f}s, agent waited {waited:.2f}s")
+
+    def _get_summary_agent(self):
+        """Use the Curator for summarization, or any available agent as a fallback."""
+        summary_agent = self.registry.get_observer("the_curator")
+        if not summary_agent:
+            for agent in self.registry.agents.values():
+                summary_agent = agent
+                break
+        return summary_agent
+
+    @staticmethod
+    async def _summarize(summary_agent, api_keys: dict | None, prompt: str) -> str:
+        """Run a one-shot summarization request and return the stripped text."""
+        summary_response = ""
+        async for item in summary_agent.stream_response(
+            [{"role": "user", "content": prompt}], api_keys=api_keys
+        ):
+            if not isinstance(item, Usage):
+                summary_response += item
+        return summary_response.strip()
+
     # ── Helpers ──
 
+    @staticmethod
+    def _live_keys(api_keys: dict | None, cmd: dict) -> dict:
+        """Apply per-command overrides for live settings."""
+        live_keys = dict(api_keys or {})
+        for setting in ("word_limit", "tone", "context_limit"):
+            if setting in cmd:
+                live_keys[setting] = cmd[setting]
+        return live_keys
+
     def _clean_json_response(self, raw: str) -> str:
         """Strip markdown code fences and whitespace from an LLM JSON response."""
         cleaned = raw.strip()
@@ -435,32 +835,10 @@ class DiscussionEngine:
             cleaned = cleaned.rsplit("```", 1)[0]
         return cleaned.strip()
 
-    async def _drain_user_messages(self, websocket: WebSocket, discussion: Discussion, round_num: int):
-        """Non-blocking check for user messages while an agent is streaming."""
-        while True:
-            try:
-                raw = await asyncio.wait_for(websocket.receive_text(), timeout=0.01)
-            except asyncio.TimeoutError:
-                return
-            except Exception:
-                return
-
-            try:
-                cmd = json.loads(raw)
-            except json.JSONDecodeError:
-                continue
-
-            if cmd.get("action") == "ping":
-                await self._send(websocket, {"type": "pong"})
-                continue
-
-            if cmd.get("action") != "user_message":
-                continue
-
-            content = cmd.get("message", "").strip()
-            if not content:
-                continue
-
+    async def _apply_interjections(self, websocket: WebSocket, channel: SessionChannel,
+                                   discussion: Discussion, round_num: int):
+        """Add user messages that arrived while an agent is streaming."""
+        for content in channel.take_interjections():
             discussion.add_message(Message(
                 agent_name="user",
                 content=content,
@@ -526,7 +904,8 @@ class DiscussionEngine:
                         continue_agent: str = "",
                         agent_key: str = "",
                         fixed_viewpoints: list[str] | None = None,
-                        context_limit: int = 0) -> list[dict]:
+                        context_limit: int = 0,
+                        evidence: str = "") -> list[dict]:
         """Build the message history for the Claude API call."""
         file_section = ""
         if file_context:
@@ -570,23 +949,31 @@ class DiscussionEngine:
                 f"Do NOT invent new ones or rephrase them."
             )
 
+        # Prefetched topic searches (round 1 only); kept with the per-turn
+        # instructions so the cacheable prefix doesn't change when it arrives
+        evidence_section = ""
+        if evidence:
+            evidence_section = (
+                f"\n\nWeb search results already gathered on this topic:\n{evidence}\n"
+                f"Cite these with their links where relevant. Only use web_search for "
+                f"something they don't cover."
+            )
+
+        # Stable context first; per-turn instructions always go last
+        context = f"The discussion topic is: {topic}{file_section}"
+
         if not discussion.messages:
-            return [{
-                "role": "user",
-                "content": (
-                    f"The discussion topic is: {topic}{file_section}\n\n"
-                    f"Please share your perspective. If you need current data or sources, "
-                    f"use the web_search tool to find evidence and include links in your response."
-                    f"{viewpoint_instruction}"
-                    f"{tone_instruction}"
-                    f"{word_limit_instruction}"
-                ),
-            }]
+            return self._layout_messages(context, [], (
+                f"\n\nPlease share your perspective. If you need current data or sources, "
+                f"use the web_search tool to find evidence and include links in your response."
+                f"{evidence_section}"
+                f"{viewpoint_instruction}"
+                f"{tone_instruction}"
+                f"{word_limit_instruction}"
+            ))
 
-        last_user_message = next(
-            (m.content for m in reversed(discussion.messages) if m.agent_name == "user"),
-            "",
-        )
+        last_user = discussion.latest_message("user")
+        last_user_message = last_user.content if last_user else ""
         user_instruction = ""
         if last_user_message:
             user_instruction = (
@@ -599,27 +986,22 @@ class DiscussionEngine:
 
         # Use compacted transcript if available, otherwise full transcript
         if (context_limit > 0 and current_round > 1
-                and discussion._compacted_summary
-                and discussion._compacted_through_round >= current_round - 1):
-            current_round_text = discussion.get_current_round_transcript(current_round)
-            transcript = (
+                and discussion.summaries
+                and discussion.summarized_through >= current_round - 1):
+            transcript_segments = [(
                 f"Topic: {topic}\n\n"
-                f"═══ SUMMARY OF PREVIOUS ROUNDS (rounds 1-{discussion._compacted_through_round}) ═══\n"
-                f"{discussion._compacted_summary}\n"
+                f"═══ SUMMARY OF PREVIOUS ROUNDS (rounds 1-{discussion.summarized_through}) ═══\n"
+                f"{discussion.get_compacted_summary()}\n"
                 f"═══ END SUMMARY ═══\n\n"
-                f"{current_round_text}"
-            )
+            )] + discussion.get_current_round_segments(current_round)
         else:
-            transcript = discussion.get_transcript()
+            transcript_segments = discussion.get_transcript_segments()
 
         # Extract The Judge's latest verdict to inject as priority instruction
         judge_instruction = ""
         if current_round > 1 and agent_key not in ("the_judge", "sentiment_analyst"):
-            judge_message = None
-            for m in reversed(discussion.messages):
-                if m.agent_name == "The Judge":
-                    judge_message = m.content
-                    break
+            judge = discussion.latest_message("The Judge")
+            judge_message = judge.content if judge else None
             if judge_message:
                 judge_instruction = (
                     "\n\n═══ THE JUDGE'S LATEST VERDICT ═══\n"
@@ -631,18 +1013,13 @@ class DiscussionEngine:
                 )
 
         if continuation_instruction:
-            return [{
-                "role": "user",
-                "content": (
-                    f"The discussion topic is: {topic}{file_section}\n\n"
-                    f"Here is the discussion so far:\n{transcript}\n\n"
-                    f"{continuation_instruction}"
-                    f"{judge_instruction}"
-                    f"{viewpoint_instruction}"
-                    f"{tone_instruction}"
-                    f"{word_limit_instruction}"
-                ),
-            }]
+            return self._layout_messages(context, transcript_segments, (
+                f"\n\n{continuation_instruction}"
+                f"{judge_instruction}"
+                f"{viewpoint_instruction}"
+                f"{tone_instruction}"
+                f"{word_limit_instruction}"
+            ))
 
         # The Judge gets a special round instruction — evaluate the discussion, don't debate
         if agent_key == "the_judge":
@@ -661,19 +1038,33 @@ class DiscussionEngine:
                 f"Use the web_search tool if you need current data or sources to back up your claims."
             )
 
-        return [{
-            "role": "user",
-            "content": (
-                f"The discussion topic is: {topic}{file_section}\n\n"
-                f"Here is the discussion so far:\n{transcript}\n\n"
-                f"{user_instruction}"
-                f"{judge_instruction}\n\n"
-                f"{round_instruction}"
-                f"{viewpoint_instruction}"
-                f"{tone_instruction}"
-                f"{word_limit_instruction}"
-            ),
-        }]
+        return self._layout_messages(context, transcript_segments, (
+            f"\n\n{user_instruction}"
+            f"{judge_instruction}\n\n"
+            f"{round_instruction}"
+            f"{evidence_section}"
+            f"{viewpoint_instruction}"
+            f"{tone_instruction}"
+            f"{word_limit_instruction}"
+        ))
+
+    @staticmethod
+    def _layout_messages(context: str, transcript_segments: list[str], instructions: str) -> list[dict]:
+        """Lay the prompt out as text blocks ordered from most to least stable.
+
+        Topic/file context and the append-only transcript are flagged cacheable
+        (the last transcript block marks the end of the reusable prefix); the
+        volatile instructions come last. Concatenating the blocks gives the
+        plain-text prompt.
+        """
+        blocks = [{"type": "text", "text": context, CACHEABLE: True}]
+        if transcript_segments:
+            segments = list(transcript_segments)
+            segments[0] = f"\n\nHere is the discussion so far:\n{segments[0]}"
+            blocks.extend({"type": "text", "text": seg} for seg in segments)
+            blocks[-1][CACHEABLE] = True
+        blocks.append({"type": "text", "text": instructions})
+        return [{"role": "user", "content": blocks}]
 
     async def _send(self, websocket: WebSocket, data: dict):
         """Send data to the frontend, silently ignoring connection errors."""
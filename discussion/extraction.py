@@ -0,0 +1,243 @@
+"""Runs file extraction in worker processes, off the event loop.
+
+Parsing a long PDF or a large workbook is CPU-bound and can take seconds, so
+``process_file`` runs in a bounded ``ProcessPoolExecutor``. Submissions are
+gated by a semaphore sized to the pool, so every submitted job is running
+and anything beyond that waits in the (observable) queue. Each job gets a
+timeout and each worker process an address-space cap. A job that times out
+cannot be interrupted, so its pool is retired: new work goes to a fresh pool
+and the old one's processes are terminated once every job it was running
+has had its full timeout.
+
+Results are cached in the database by (content sha256, extension, extractor
+version), so a file that was uploaded before, by anyone, is not parsed again.
+Cached text is stored with a placeholder where the filename goes, and the
+uploader's own filename is substituted on the way out.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from database import db
+from discussion.files import EXTRACTOR_VERSION, process_file
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory cap
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_NAME_TOKEN = "\x00file\x00"
+
+
+def _limit_memory(max_bytes: int):
+    if resource is not None and max_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _private_link(path: str) -> str | BinaryIO:
+    """A second name for a spooled upload, removed independently of the first.
+
+    Where hard links aren't supported, returns the upload opened for reading
+    instead: the open handle keeps its data readable after the uploader
+    deletes it, and ``_private_copy`` copies it off the event loop.
+    """
+    fd, private = tempfile.mkstemp(prefix="extract-", dir=os.path.dirname(path))
+    os.close(fd)
+    os.unlink(private)
+    try:
+        os.link(path, private)
+    except OSError:
+        return open(path, "rb")
+    return private
+
+
+def _private_copy(upload: BinaryIO) -> str:
+    with upload:
+        fd, private = tempfile.mkstemp(prefix="extract-", dir=os.path.dirname(upload.name))
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(upload, out)
+    return private
+
+
+def _unlink_quietly(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class ExtractionPool:
+    def __init__(self, workers: int = 2, timeout: float = 60.0, memory_mb: int = 1024):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self._pool: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._retiring: dict[asyncio.Task, ProcessPoolExecutor] = {}
+        self._stats: dict[str, dict] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: the server process runs threads (database, event loop) that fork would copy mid-flight
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_limit_memory,
+                initargs=(self.memory_bytes,),
+            )
+        return self._pool
+
+    def _type_stats(self, filename: str) -> dict:
+        ext = os.path.splitext(filename)[1].lower() or "(none)"
+        return self._stats.setdefault(ext, {
+            "queued": 0, "running": 0, "done": 0, "errors": 0, "timeouts": 0,
+            "total_ms": 0.0, "max_ms": 0.0,
+        })
+
+    async def extract(self, filename: str, source: bytes | str, content_hash: str = "") -> str:
+        """Extract text from one upload (bytes or a file path).
+
+        With ``content_hash`` (sha256 hex of the content) the result is served
+        from / stored in the extraction cache, and concurrent uploads of the
+        same file share one extraction. Failures come back as a bracketed
+        note, like ``process_file``, and are never cached.
+        """
+        if not content_hash:
+            return await self._extract(filename, source)
+
+        ext = os.path.splitext(filename)[1].lower()
+        key = f"{content_hash}:{ext}:{EXTRACTOR_VERSION}"
+        anonymous = _NAME_TOKEN + ext
+        text = await db.get_extraction(key)
+        if text is not None:
+            self._cache_stats["hits"] += 1
+            await db.touch_extraction(key)
+        else:
+            task = self._inflight.get(key)
+            if task:
+                self._cache_stats["coalesced"] += 1
+            else:
+                self._cache_stats["misses"] += 1
+                # Uploads coalesced onto this task rely on its source, but the
+                # first uploader deletes its temp file when its request ends
+                # (even if cancelled), so the task works on its own link to it.
+                # Linked (or opened) inline, before any await, so a duplicate
+                # upload arriving meanwhile still finds the task registered
+                if isinstance(source, str):
+                    source = _private_link(source)
+                task = asyncio.create_task(self._extract_and_cache(key, anonymous, source))
+                self._inflight[key] = task
+                task.add_done_callback(lambda t: self._inflight.pop(key, None))
+            text = await asyncio.shield(task)
+        return text.replace(anonymous, filename)
+
+    async def _extract_and_cache(self, key: str, filename: str, source: bytes | str | BinaryIO) -> str:
+        if not isinstance(source, (bytes, str)):
+            try:
+                source = await asyncio.to_thread(_private_copy, source)
+            except OSError as e:
+                return f"[Error processing {filename}: {e}]"
+        try:
+            text = await self._extract(filename, source)
+            if not text.startswith("[Error processing"):
+                self._cache_stats["evictions"] += await db.put_extraction(key, text)
+            return text
+        finally:
+            if isinstance(source, str):
+                _unlink_quietly(source)
+
+    async def _extract(self, filename: str, source: bytes | str) -> str:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        stats = self._type_stats(filename)
+        start = time.monotonic()
+        stats["queued"] += 1
+        try:
+            async with self._slots:
+                stats["queued"] -= 1
+                stats["running"] += 1
+                try:
+                    pool = self._get_pool()
+                    future = asyncio.get_running_loop().run_in_executor(pool, process_file, filename, source)
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    stats["timeouts"] += 1
+                    self._retire(pool)
+                    return f"[Error processing {filename}: extraction timed out after {self.timeout:.0f}s]"
+                except BrokenProcessPool:
+                    # A worker died, e.g. killed by the OS; the pool can't be reused
+                    stats["errors"] += 1
+                    self._retire(pool)
+                    return f"[Error processing {filename}: extraction worker crashed]"
+                except Exception as e:
+                    stats["errors"] += 1
+                    return f"[Error processing {filename}: {e}]"
+                finally:
+                    stats["running"] -= 1
+        finally:
+            elapsed_ms = (time.monotonic() - start) * 1000
+            stats["done"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def _retire(self, pool: ProcessPoolExecutor):
+        if self._pool is not pool:
+            return  # Already replaced
+        self._pool = None
+        pool.shutdown(wait=False)
+        task = asyncio.create_task(self._terminate_later(pool))
+        self._retiring[task] = pool
+        task.add_done_callback(lambda t: self._retiring.pop(t, None))
+
+    async def _terminate_later(self, pool: ProcessPoolExecutor):
+        # Every job still running there started before now and has at most
+        # ``timeout`` left, after which its caller has given up anyway
+        await asyncio.sleep(self.timeout)
+        self._terminate(pool)
+
+    @staticmethod
+    def _terminate(pool: ProcessPoolExecutor):
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            if process.is_alive():
+                logger.warning(f"Terminating stuck extraction worker {process.pid}")
+                process.terminate()
+
+    async def aclose(self):
+        for task, pool in list(self._retiring.items()):
+            task.cancel()
+            self._terminate(pool)
+        pool, self._pool = self._pool, None
+        if pool:
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def cache_stats(self) -> dict:
+        lookups = self._cache_stats["hits"] + self._cache_stats["misses"] + self._cache_stats["coalesced"]
+        saved = self._cache_stats["hits"] + self._cache_stats["coalesced"]
+        return {**self._cache_stats, "hit_rate": round(saved / lookups, 3) if lookups else 0.0}
+
+    def stats(self) -> dict:
+        return {
+            ext: {
+                "queue_depth": s["queued"] + s["running"],
+                "queued": s["queued"],
+                "running": s["running"],
+                "done": s["done"],
+                "errors": s["errors"],
+                "timeouts": s["timeouts"],
+                "avg_ms": round(s["total_ms"] / s["done"], 1) if s["done"] else 0.0,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for ext, s in self._stats.items()
+        }
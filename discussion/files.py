@@ -1,13 +1,30 @@
-"""Process uploaded files into text that can be fed to agents as context."""
+"""Process uploaded files into text that can be fed to agents as context.
+
+Processors read from a binary file handle and stop once they have what they
+show, so a large upload is never loaded whole just to be truncated.
+"""
 
 import csv
 import io
 import os
 import html.parser
+from typing import BinaryIO
+
+from config import EXCEL_TOKEN_BUDGET
+from discussion.profiling import TableProfile
+
+TEXT_LIMIT = 10000  # characters kept from text-like files
+
+# Part of the extraction cache key: bump whenever a processor's output changes.
+# Settings that shape the output are included so changing them invalidates it.
+EXTRACTOR_VERSION = f"4-xl{EXCEL_TOKEN_BUDGET}"
 
 
-def process_file(filename: str, content: bytes) -> str:
-    """Route a file to the appropriate processor based on extension. Returns extracted text."""
+def process_file(filename: str, source: bytes | str) -> str:
+    """Route a file to the appropriate processor based on extension. Returns extracted text.
+
+    ``source`` is the file's bytes or a path to it (spooled uploads).
+    """
     ext = os.path.splitext(filename)[1].lower()
     processors = {
         ".csv": _process_csv,
@@ -38,51 +55,74 @@ def process_file(filename: str, content: bytes) -> str:
     if not processor:
         return f"[Unsupported file type: {ext}. File name: {filename}]"
     try:
-        return processor(filename, content)
+        with (open(source, "rb") if isinstance(source, str) else io.BytesIO(source)) as fh:
+            return processor(filename, fh)
     except Exception as e:
         return f"[Error processing {filename}: {e}]"
 
 
-def _process_csv(filename: str, content: bytes) -> str:
-    text = content.decode("utf-8", errors="replace")
-    reader = csv.reader(io.StringIO(text))
-    rows = list(reader)
-    if not rows:
+def _text_stream(fh: BinaryIO) -> io.TextIOWrapper:
+    return io.TextIOWrapper(fh, encoding="utf-8", errors="replace", newline="")
+
+
+def _read_limited(fh: BinaryIO) -> str:
+    text = _text_stream(fh).read(TEXT_LIMIT + 1)
+    if len(text) > TEXT_LIMIT:
+        text = text[:TEXT_LIMIT] + "\n... (truncated)"
+    return text
+
+
+def _process_csv(filename: str, fh: BinaryIO) -> str:
+    # One streaming pass: statistics over every row, plus a small sample
+    reader = csv.reader(_text_stream(fh))
+    header = next(reader, None)
+    if header is None:
         return "[Empty CSV file]"
-    # Show header + up to 50 data rows
-    header = rows[0]
-    data_rows = rows[1:51]
-    lines = [f"CSV file: {filename} ({len(rows)-1} data rows)"]
-    lines.append("Columns: " + " | ".join(header))
-    lines.append("---")
-    for row in data_rows:
-        lines.append(" | ".join(row))
-    if len(rows) > 51:
-        lines.append(f"... ({len(rows)-51} more rows truncated)")
+    profile = TableProfile(header)
+    profile.consume(reader)
+    lines = [f"CSV file: {filename} ({profile.rows:,} data rows, {len(header)} columns)"]
+    lines.extend(profile.render())
     return "\n".join(lines)
 
 
-def _process_excel(filename: str, content: bytes) -> str:
+def _process_excel(filename: str, fh: BinaryIO) -> str:
+    # Each sheet is streamed once (read-only mode) into a TableProfile; the
+    # first non-empty row is taken as the header
     from openpyxl import load_workbook
-    wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
-    lines = [f"Excel file: {filename}"]
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        lines.append(f"\n## Sheet: {sheet_name}")
-        row_count = 0
-        for row in ws.iter_rows(values_only=True):
-            if row_count >= 50:
-                lines.append("... (rows truncated)")
-                break
-            lines.append(" | ".join(str(c) if c is not None else "" for c in row))
-            row_count += 1
-    wb.close()
+    wb = load_workbook(fh, read_only=True, data_only=True)
+    try:
+        profiles = {name: _profile_sheet(wb[name]) for name in wb.sheetnames}
+    finally:
+        wb.close()
+
+    lines = [f"Excel file: {filename} ({len(profiles)} sheet{'s' if len(profiles) != 1 else ''})"]
+    # Budget is shared out evenly; what a small sheet doesn't use goes to the rest
+    remaining = EXCEL_TOKEN_BUDGET * 4  # ~4 characters per token
+    for i, (name, profile) in enumerate(profiles.items()):
+        share = remaining // (len(profiles) - i)
+        if profile is None:
+            section = [f"\n## Sheet: {name} (empty)"]
+        else:
+            section = [f"\n## Sheet: {name} ({profile.rows:,} data rows, {len(profile.header)} columns)"]
+            section.extend(profile.render(max_chars=max(share - len(section[0]), 200)))
+        lines.extend(section)
+        remaining -= sum(len(line) + 1 for line in section)
     return "\n".join(lines)
 
 
-def _process_pdf(filename: str, content: bytes) -> str:
+def _profile_sheet(ws) -> TableProfile | None:
+    rows = (row for row in ws.iter_rows(values_only=True) if any(c is not None and c != "" for c in row))
+    header = next(rows, None)
+    if header is None:
+        return None
+    profile = TableProfile(list(header))
+    profile.consume(rows)
+    return profile
+
+
+def _process_pdf(filename: str, fh: BinaryIO) -> str:
     from pypdf import PdfReader
-    reader = PdfReader(io.BytesIO(content))
+    reader = PdfReader(fh)
     lines = [f"PDF file: {filename} ({len(reader.pages)} pages)"]
     for i, page in enumerate(reader.pages[:30]):  # cap at 30 pages
         text = page.extract_text()
@@ -93,49 +133,50 @@ def _process_pdf(filename: str, content: bytes) -> str:
     return "\n".join(lines)
 
 
-def _process_html(filename: str, content: bytes) -> str:
-    text = content.decode("utf-8", errors="replace")
-
+def _process_html(filename: str, fh: BinaryIO) -> str:
     class _HTMLTextExtractor(html.parser.HTMLParser):
         def __init__(self):
             super().__init__()
             self.parts = []
+            self.size = 0
 
         def handle_data(self, data):
             self.parts.append(data)
+            self.size += len(data) + 1
 
     extractor = _HTMLTextExtractor()
-    extractor.feed(text)
+    stream = _text_stream(fh)
+    # Feed in chunks until there is more text than we keep
+    while extractor.size <= TEXT_LIMIT and (chunk := stream.read(64 * 1024)):
+        extractor.feed(chunk)
     extracted = " ".join(extractor.parts).strip()
-    if len(extracted) > 10000:
-        extracted = extracted[:10000] + "\n... (truncated)"
+    if len(extracted) > TEXT_LIMIT:
+        extracted = extracted[:TEXT_LIMIT] + "\n... (truncated)"
     return f"HTML file: {filename}\n\n{extracted}"
 
 
-def _process_text(filename: str, content: bytes) -> str:
-    text = content.decode("utf-8", errors="replace")
-    if len(text) > 10000:
-        text = text[:10000] + "\n... (truncated)"
+def _process_text(filename: str, fh: BinaryIO) -> str:
+    text = _read_limited(fh)
     return f"File: {filename}\n\n{text}"
 
 
-def _process_docx(filename: str, content: bytes) -> str:
+def _process_docx(filename: str, fh: BinaryIO) -> str:
     from docx import Document
-    doc = Document(io.BytesIO(content))
+    doc = Document(fh)
     paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
     text = "\n".join(paragraphs)
-    if len(text) > 10000:
-        text = text[:10000] + "\n... (truncated)"
+    if len(text) > TEXT_LIMIT:
+        text = text[:TEXT_LIMIT] + "\n... (truncated)"
     return f"Word document: {filename}\n\n{text}"
 
 
-def _process_image(filename: str, content: bytes) -> str:
+def _process_image(filename: str, fh: BinaryIO) -> str:
     from PIL import Image
-    img = Image.open(io.BytesIO(content))
+    img = Image.open(fh)  # Lazy: reads the header only, pixel data is never decoded
     info = f"Image file: {filename} ({img.format}, {img.size[0]}x{img.size[1]}, mode={img.mode})"
     return f"[{info} — image content cannot be read as text, but the file has been attached for reference]"
 
 
-def _process_video(filename: str, content: bytes) -> str:
-    size_mb = len(content) / (1024 * 1024)
+def _process_video(filename: str, fh: BinaryIO) -> str:
+    size_mb = fh.seek(0, os.SEEK_END) / (1024 * 1024)
     return f"[Video file: {filename} ({size_mb:.1f} MB) — video content noted for discussion context]"
@@ -28,6 +28,69 @@ class Message:
         )
 
 
+def _format_line(msg: Message) -> str:
+    label = "User" if msg.agent_name == "user" else msg.agent_name
+    return f"{label}: {msg.content}\n"
+
+
+class _TranscriptIndex:
+    """Transcript pieces built once per message and extended as messages arrive.
+
+    ``segments[i]`` is message i's slice of the full transcript (with its
+    round header if it opens a round); ``round_segments`` holds the
+    current-round form of each line. Messages are append-only: if the list
+    ever shrinks the index is rebuilt from scratch.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.segments: list[str] = []
+        self.round_segments: dict[int, list[str]] = {}
+        self.run_starts: list[tuple[int, int]] = []  # (round_num, first message index) per run of a round
+        self.latest_by_agent: dict[str, int] = {}
+        # (header, message count, header + "".join(segments)), extended incrementally
+        self.full: tuple[str, int, str] = ("", 0, "")
+        self.older: dict[tuple[str, int], str] = {}  # (header, round) -> older rounds, once that round began
+
+    def sync(self, messages: list[Message]):
+        if self.count > len(messages):
+            self.__init__()
+        for i in range(self.count, len(messages)):
+            msg = messages[i]
+            line = _format_line(msg)
+            prev_round = messages[i - 1].round_num if i else 0
+            if msg.round_num != prev_round:
+                self.run_starts.append((msg.round_num, i))
+                self.segments.append(f"\n\n--- Round {msg.round_num} ---\n\n{line}")
+            else:
+                self.segments.append("\n" + line)
+            self.round_segments.setdefault(msg.round_num, []).append("\n" + line)
+            self.latest_by_agent[msg.agent_name] = i
+        self.count = len(messages)
+
+    def transcript(self, header: str) -> str:
+        cached_header, cached_count, text = self.full
+        if cached_header != header:
+            cached_count, text = 0, header
+        if cached_count != self.count:
+            self.full = ("", 0, "")  # drop our reference so CPython can extend the string in place
+            text += "".join(self.segments[cached_count:self.count])
+            self.full = (header, self.count, text)
+        return text
+
+    def before_round(self, header: str, current_round: int) -> str:
+        """Transcript up to the first message of ``current_round`` or later."""
+        key = (header, current_round)
+        if key in self.older:
+            return self.older[key]
+        cut = next((i for r, i in self.run_starts if r >= current_round), None)
+        if cut is None:
+            return self.transcript(header)  # round hasn't started: everything so far is older
+        # Once the round has begun, the older part can never change again
+        self.older[key] = header + "".join(self.segments[:cut])
+        return self.older[key]
+
+
 @dataclass
 class Discussion:
     topic: str
@@ -35,48 +98,81 @@ class Discussion:
     total_rounds: int = 2
     file_context: str = ""  # extracted text from uploaded files
     agent_keys: list[str] = field(default_factory=list)  # which agents are participating
-    # Compaction cache — LLM-generated summary of older rounds (not persisted)
-    _compacted_summary: str = field(default="", repr=False)
-    _compacted_through_round: int = field(default=0, repr=False)
-    _compacted_msg_count: int = field(default=0, repr=False)
+    # Rolling compaction — LLM summaries of closed rounds, persisted with the export.
+    # Each entry is {"first": int, "last": int, "text": str}, oldest first; adjacent
+    # entries are merged as the discussion grows.
+    summaries: list[dict] = field(default_factory=list, repr=False)
+    # The two sentiment viewpoints: user-provided, or fixed from round 1's analysis
+    viewpoints: list[str] = field(default_factory=list)
+    # Derived transcript cache — rebuilt lazily, never copied or exported
+    _index: _TranscriptIndex = field(default_factory=_TranscriptIndex, init=False, repr=False, compare=False)
+    # Persistence cursor: messages already stored as rows, and which compaction
+    # state the stored session header reflects (see export_state)
+    saved_messages: int = field(default=0, init=False, repr=False, compare=False)
+    saved_state_key: tuple | None = field(default=None, init=False, repr=False, compare=False)
+    # Topic searches prefetched at session start (an asyncio.Task yielding the
+    # evidence digest for round 1 prompts); runtime only, never exported
+    evidence_task: object | None = field(default=None, init=False, repr=False, compare=False)
 
     def add_message(self, message: Message):
         self.messages.append(message)
+        self._index.sync(self.messages)
+
+    def _synced(self) -> _TranscriptIndex:
+        # Cheap no-op unless messages were appended behind our back
+        self._index.sync(self.messages)
+        return self._index
+
+    @property
+    def summarized_through(self) -> int:
+        """Last round covered by the rolling summaries (0 if none)."""
+        return self.summaries[-1]["last"] if self.summaries else 0
+
+    def get_compacted_summary(self) -> str:
+        """All rolling summaries, oldest first."""
+        return "\n\n".join(
+            f"[Round {s['first']}]\n{s['text']}" if s["first"] == s["last"]
+            else f"[Rounds {s['first']}-{s['last']}]\n{s['text']}"
+            for s in self.summaries
+        )
+
+    def latest_message(self, agent_name: str) -> Message | None:
+        """Most recent message from ``agent_name`` ("user" for the user)."""
+        i = self._synced().latest_by_agent.get(agent_name)
+        return self.messages[i] if i is not None else None
+
+    def get_transcript_segments(self) -> list[str]:
+        """Split the transcript into one segment per message (round headers attached).
+
+        Segments only ever grow at the end, so a provider can cache the prefix.
+        ``"".join(segments)`` equals ``get_transcript()``.
+        """
+        return [f"Topic: {self.topic}\n"] + self._synced().segments
 
     def get_transcript(self) -> str:
         """Build a readable transcript of the discussion so far."""
-        lines = [f"Topic: {self.topic}\n"]
-        current_round = 0
-        for msg in self.messages:
-            if msg.round_num != current_round:
-                current_round = msg.round_num
-                lines.append(f"\n--- Round {current_round} ---\n")
-            label = "User" if msg.agent_name == "user" else msg.agent_name
-            lines.append(f"{label}: {msg.content}\n")
-        return "\n".join(lines)
+        return self._synced().transcript(f"Topic: {self.topic}\n")
+
+    def get_current_round_segments(self, current_round: int) -> list[str]:
+        """Per-message segments of the current round, header first."""
+        return [f"\n--- Round {current_round} ---\n"] + self._synced().round_segments.get(current_round, [])
 
     def get_current_round_transcript(self, current_round: int) -> str:
         """Build a transcript of ONLY the current round's messages."""
-        lines = [f"\n--- Round {current_round} ---\n"]
-        for msg in self.messages:
-            if msg.round_num == current_round:
-                label = "User" if msg.agent_name == "user" else msg.agent_name
-                lines.append(f"{label}: {msg.content}\n")
-        return "\n".join(lines)
+        return "".join(self.get_current_round_segments(current_round))
+
+    def get_rounds_transcript(self, first: int, last: int) -> str:
+        """Build a transcript of rounds ``first`` through ``last`` only."""
+        index = self._synced()
+        return "".join(
+            f"\n--- Round {r} ---\n" + "".join(index.round_segments[r])
+            for r in range(first, last + 1)
+            if r in index.round_segments
+        )
 
     def get_older_rounds_transcript(self, current_round: int) -> str:
         """Build a transcript of all rounds before the current one."""
-        lines = [f"Topic: {self.topic}\n"]
-        current = 0
-        for msg in self.messages:
-            if msg.round_num >= current_round:
-                break
-            if msg.round_num != current:
-                current = msg.round_num
-                lines.append(f"\n--- Round {current} ---\n")
-            label = "User" if msg.agent_name == "user" else msg.agent_name
-            lines.append(f"{label}: {msg.content}\n")
-        return "\n".join(lines)
+        return self._synced().before_round(f"Topic: {self.topic}\n", current_round)
 
     def export(self) -> dict:
         """Export discussion state for download. Keeps full content, no lossy summarization."""
@@ -86,20 +182,45 @@ class Discussion:
             "agent_keys": self.agent_keys,
             "file_context": self.file_context,
             "messages": [m.to_dict() for m in self.messages],
+            "summaries": [dict(s) for s in self.summaries],
+            "viewpoints": list(self.viewpoints),
         }
 
+    def export_state(self) -> dict:
+        """The export minus messages and file context, which the database stores separately."""
+        return {
+            "topic": self.topic,
+            "total_rounds": self.total_rounds,
+            "agent_keys": self.agent_keys,
+            "summaries": [dict(s) for s in self.summaries],
+            "viewpoints": list(self.viewpoints),
+        }
+
+    @property
+    def state_key(self) -> tuple:
+        """Changes whenever export_state() would; only compaction and viewpoints edit it mid-session."""
+        return len(self.summaries), self.summarized_through, tuple(self.viewpoints)
+
     def export_json(self) -> str:
         return json.dumps(self.export(), indent=2)
 
     @staticmethod
-    def from_export(data: dict) -> "Discussion":
-        """Reconstruct a Discussion from exported JSON data."""
+    def from_export(data: dict, messages: list[dict] | None = None) -> "Discussion":
+        """Reconstruct a Discussion from exported JSON data.
+
+        ``messages`` overrides ``data["messages"]``, for sessions whose messages
+        are loaded from the database's message rows.
+        """
         d = Discussion(
             topic=data["topic"],
             total_rounds=data.get("total_rounds", 2),
             file_context=data.get("file_context", ""),
             agent_keys=data.get("agent_keys", []),
+            summaries=data.get("summaries", []),
+            viewpoints=data.get("viewpoints", []),
         )
-        for m in data.get("messages", []):
-            d.messages.append(Message.from_dict(m))
+        for m in data.get("messages", []) if messages is None else messages:
+            d.add_message(Message.from_dict(m))
+        if messages is not None:
+            d.saved_messages = len(messages)  # Already stored as rows; only new ones get appended
         return d
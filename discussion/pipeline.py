@@ -0,0 +1,66 @@
+"""Per-session background pipeline for post-turn work.
+
+Persistence and Curator checks don't affect what the next agent says, so the
+engine queues them here and sends ``ready`` straight away. Jobs run one at a
+time in submission order, so writes land in order and a Curator requeue
+always refers to the response it was queued after. The backlog is bounded:
+when it is full, ``submit`` waits, which slows generation down instead of
+letting work pile up.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TurnPipeline:
+    def __init__(self, max_backlog: int = 32, stats: dict | None = None):
+        self._queue: asyncio.Queue[tuple[str, Callable[[], Awaitable]]] = asyncio.Queue(maxsize=max_backlog)
+        self._worker: asyncio.Task | None = None
+        # Shared across sessions by the engine for /api/admin/metrics
+        self.stats = stats if stats is not None else {}
+        for key, default in (("jobs", 0), ("failed", 0), ("seconds", 0.0), ("max_backlog", 0)):
+            self.stats.setdefault(key, default)
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, label: str, job: Callable[[], Awaitable]):
+        """Queue ``job`` (a zero-argument coroutine function) behind earlier work."""
+        await self._queue.put((label, job))
+        self.stats["max_backlog"] = max(self.stats["max_backlog"], self._queue.qsize())
+
+    async def _run(self):
+        while True:
+            label, job = await self._queue.get()
+            start = time.monotonic()
+            try:
+                await job()
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"Post-turn job '{label}' failed: {e}")
+            finally:
+                self.stats["jobs"] += 1
+                self.stats["seconds"] += time.monotonic() - start
+                self._queue.task_done()
+
+    async def flush(self):
+        """Wait until everything submitted so far has run."""
+        await self._queue.join()
+
+    async def close(self, timeout: float = 30.0):
+        """Flush outstanding work (bounded by ``timeout``), then stop the worker."""
+        if not self._worker:
+            return
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} post-turn jobs after {timeout}s flush timeout")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
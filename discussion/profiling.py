@@ -0,0 +1,288 @@
+"""Single-pass, constant-memory statistical profiles of tabular data.
+
+Used by the CSV and spreadsheet processors so agents get a summary of the
+whole table (types, ranges, quantiles, nulls, common values) plus a small
+sample, rather than the first rows verbatim. Rows are consumed in chunks and
+each column is updated from its slice of the chunk. Everything kept per
+column is bounded: quantiles come from a fixed-size reservoir and top values
+from a capped space-saving counter, so memory doesn't grow with the file.
+"""
+
+import math
+import random
+import re
+from collections import Counter
+from datetime import date, datetime, time
+from itertools import zip_longest
+
+CHUNK_ROWS = 2000
+RESERVOIR_SIZE = 2048
+TOP_K_CAPACITY = 64
+NULL_TOKENS = {"", "na", "n/a", "nan", "null", "none", "-", "--", "#n/a"}
+
+# Accounting negatives need both parentheses: "(12)", never "(12" or "12)"
+_NUMBER = re.compile(r"^(\()?[-+]?[$€£¥]?\s*[-+]?(\d{1,3}(,\d{3})+|\d+)?(\.\d+)?([eE][-+]?\d+)?(?(1)\))%?$")
+# ISO dates only, so min/max can be compared as strings
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+_NUMBER_NOISE = str.maketrans("", "", "()$€£¥%, \t")
+_NUMBER_PREFIXES = set("($€£¥+-")
+_BOOL_WORDS = {"true", "false", "yes", "no"}
+
+
+def _parse_number(text: str) -> float | None:
+    """Plain, thousands-separated, currency, percent and (negative) accounting numbers."""
+    if not _NUMBER.match(text):
+        return None
+    negative = text[0] == "(" and text[-1] == ")"
+    try:
+        value = float(text.translate(_NUMBER_NOISE))
+    except ValueError:  # No digits at all, e.g. "$" or "."
+        return None
+    if not math.isfinite(value):  # Exponent overflow, e.g. "1e999"
+        return None
+    return -value if negative else value
+
+
+class ColumnProfile:
+    def __init__(self, name: str, rng: random.Random):
+        self.name = name
+        self.rng = rng
+        self.count = 0
+        self.nulls = 0
+        self.types = {"number": 0, "date": 0, "bool": 0, "text": 0}
+        self.num_seen = 0
+        self.num_min: float | None = None
+        self.num_max: float | None = None
+        self.num_sum = 0.0
+        self.integers = True
+        self.reservoir: list[float] = []
+        self.date_min: str | None = None
+        self.date_max: str | None = None
+        self.top: dict[str, int] = {}
+        self.plain_numbers = True
+
+    def update(self, values: list):
+        """Add one chunk of this column's values (strings from CSV, typed cells from sheets).
+
+        Values are first sorted into per-type lists; the aggregates are then
+        updated once per chunk with builtins (min/max/sum/Counter) rather
+        than value by value.
+        """
+        if self.plain_numbers and bool in set(map(type, values)):
+            self.plain_numbers = False  # float() would count sheet booleans as 0/1
+        if self.plain_numbers:
+            try:  # Whole chunk of plain numbers: one C-level pass
+                numbers = list(map(float, values))
+            except (TypeError, ValueError):
+                self.plain_numbers = False  # Don't retry on every chunk
+            else:
+                if math.isfinite(math.fsum(numbers)):
+                    self.count += len(numbers)
+                    self._add_numbers(numbers)
+                    return
+                self.plain_numbers = False
+        numbers = []
+        dates: list[str] = []
+        flags: list[str] = []
+        texts: list[str] = []
+        nulls = 0
+        for value in values:
+            if value is None:
+                nulls += 1
+                continue
+            cls = type(value)
+            if cls is str:
+                text = value.strip()
+                if len(text) <= 4 and text.lower() in NULL_TOKENS:
+                    nulls += 1
+                    continue
+                try:
+                    number = float(text)  # Fast path for plain numbers
+                except ValueError:
+                    pass
+                else:
+                    # float() also takes "inf", "Infinity" and "nan": those are text
+                    if math.isfinite(number):
+                        numbers.append(number)
+                        continue
+                if text[0] in _NUMBER_PREFIXES or text[-1] in "%)" or "," in text:
+                    number = _parse_number(text)
+                    if number is not None:
+                        numbers.append(number)
+                        continue
+                if len(text) >= 10 and text[4] == "-" and _DATE.match(text):
+                    dates.append(text)
+                elif text.lower() in _BOOL_WORDS:
+                    flags.append(text.lower())
+                else:
+                    texts.append(text[:80])
+            elif cls is bool:
+                flags.append(str(value))
+            elif cls is int or (cls is float and math.isfinite(value)):
+                numbers.append(float(value))
+            elif isinstance(value, (datetime, date)):
+                dates.append(_cell(value))
+            else:
+                texts.append(str(value)[:80])
+
+        self.nulls += nulls
+        self.count += len(values) - nulls
+        if numbers:
+            self._add_numbers(numbers)
+        if dates:
+            self.types["date"] += len(dates)
+            low, high = min(dates), max(dates)
+            self.date_min = low if self.date_min is None else min(self.date_min, low)
+            self.date_max = high if self.date_max is None else max(self.date_max, high)
+        if flags:
+            self.types["bool"] += len(flags)
+            self._add_categories(flags)
+        if texts:
+            self.types["text"] += len(texts)
+            self._add_categories(texts)
+
+    def _add_numbers(self, numbers: list[float]):
+        self.types["number"] += len(numbers)
+        self.num_sum += math.fsum(numbers)
+        low, high = min(numbers), max(numbers)
+        self.num_min = low if self.num_min is None else min(self.num_min, low)
+        self.num_max = high if self.num_max is None else max(self.num_max, high)
+        if self.integers:
+            self.integers = all(n.is_integer() for n in numbers)
+        # Reservoir sampling (Algorithm R) for the quantiles
+        reservoir, seen, rand = self.reservoir, self.num_seen, self.rng.random
+        for value in numbers:
+            seen += 1
+            if len(reservoir) < RESERVOIR_SIZE:
+                reservoir.append(value)
+            else:
+                j = int(rand() * seen)
+                if j < RESERVOIR_SIZE:
+                    reservoir[j] = value
+        self.num_seen = seen
+
+    def _add_categories(self, values: list[str]):
+        # Space-saving: when full, the rarest entry is replaced and its count inherited
+        top = self.top
+        for text, n in Counter(values).items():
+            if text in top:
+                top[text] += n
+            elif len(top) < TOP_K_CAPACITY:
+                top[text] = n
+            else:
+                rarest = min(top, key=top.get)
+                top[text] = top.pop(rarest) + n
+
+    @property
+    def kind(self) -> str:
+        if not self.count:
+            return "empty"
+        kind, n = max(self.types.items(), key=lambda kv: kv[1])
+        if n < self.count * 0.9:
+            return "mixed"
+        if kind == "number":
+            return "integer" if self.integers else "number"
+        return kind
+
+    def describe(self) -> str:
+        total = self.count + self.nulls
+        parts = [f"- {self.name} ({self.kind})"]
+        if self.nulls:
+            parts.append(f"{self.nulls} null ({self.nulls / total:.0%})" if total else f"{self.nulls} null")
+        if self.num_seen:
+            q = sorted(self.reservoir)
+            parts.append(f"min {_fmt(self.num_min)}, p25 {_quantile(q, 0.25)}, median {_quantile(q, 0.5)}, "
+                         f"p75 {_quantile(q, 0.75)}, max {_fmt(self.num_max)}, "
+                         f"mean {_fmt(self.num_sum / self.num_seen)}")
+        if self.date_min:
+            parts.append(f"from {self.date_min} to {self.date_max}")
+        if self.top and self.kind in ("text", "bool", "mixed"):
+            ranked = sorted(self.top.items(), key=lambda kv: -kv[1])
+            shown = ", ".join(f"{v} ({n})" for v, n in ranked[:5])
+            distinct = f"{len(self.top)}+" if len(self.top) >= TOP_K_CAPACITY else str(len(self.top))
+            parts.append(f"{distinct} distinct; top: {shown}")
+        return "; ".join(parts)
+
+
+def _quantile(ordered: list[float], p: float) -> str:
+    return _fmt(ordered[min(len(ordered) - 1, int(p * len(ordered)))])
+
+
+def _fmt(value: float) -> str:
+    if not math.isfinite(value):
+        return str(value)
+    if value.is_integer() or abs(value) >= 1000:
+        return f"{value:,.0f}"
+    return f"{value:.4g}" if abs(value) < 1 else f"{value:,.2f}"
+
+
+def _cell(value) -> str:
+    """A sample cell as text; typed spreadsheet values are shortened."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time() else value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class TableProfile:
+    """Profiles a stream of rows; keeps the first rows and a reservoir of later ones as the sample."""
+
+    def __init__(self, header: list[str], head_rows: int = 5, sample_rows: int = 5, seed: int = 0):
+        self.rng = random.Random(seed)  # Fixed seed: identical files give identical profiles
+        self.header = [str(h).strip() if h not in (None, "") else f"column_{i + 1}" for i, h in enumerate(header)]
+        self.columns = [ColumnProfile(name, self.rng) for name in self.header]
+        self.rows = 0
+        self.head_rows = head_rows
+        self.sample_rows = sample_rows
+        self.head: list[list] = []
+        self.sample: list[tuple[int, list]] = []
+
+    def consume(self, rows):
+        """Profile every row of an iterable, one chunk at a time."""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                self._add_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._add_chunk(chunk)
+
+    def _add_chunk(self, chunk: list):
+        width = len(self.columns)
+        columns = zip_longest(*chunk)  # Short rows are padded with None
+        for column in self.columns:
+            column.update(list(next(columns, None) or [None] * len(chunk)))
+        for row in chunk:  # Cells beyond the header are ignored
+            self.rows += 1
+            if len(self.head) < self.head_rows:
+                self.head.append(list(row[:width]))
+            elif len(self.sample) < self.sample_rows:
+                self.sample.append((self.rows, list(row[:width])))
+            else:
+                j = self.rng.randrange(self.rows - self.head_rows)
+                if j < self.sample_rows:
+                    self.sample[j] = (self.rows, list(row[:width]))
+
+    def render(self, max_chars: int = 4000) -> list[str]:
+        """Column statistics, then sample rows, within roughly ``max_chars``."""
+        lines = ["Columns:"] + [c.describe() for c in self.columns]
+        rows = self.head + [row for _, row in sorted(self.sample)]
+        if rows:
+            lines.append(f"Sample rows (first {len(self.head)}"
+                         + (f", then {len(self.sample)} spread through the data):" if self.sample else "):"))
+            lines.append(" | ".join(self.header))
+            lines.extend(" | ".join(_cell(v) for v in row) for row in rows)
+        out, used = [], 0
+        for line in lines:
+            if used + len(line) > max_chars:
+                out.append("... (profile truncated)")
+                break
+            out.append(line)
+            used += len(line) + 1
+        return out
@@ -1,8 +1,20 @@
+import asyncio
+import hashlib
+import logging
 import re
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable
 
 import httpx
 
-from config import BRAVE_API_KEY, BRAVE_SAFESEARCH
+from config import (
+    BRAVE_API_KEY, BRAVE_SAFESEARCH, BRAVE_RATE_PER_SEC, BRAVE_BURST, BRAVE_MAX_CONNECTIONS,
+    SEARCH_CACHE_TTL_S, SEARCH_CACHE_ENTRIES,
+)
+from database import db
+
+logger = logging.getLogger(__name__)
 
 BRAVE_WEB_URL = "https://api.search.brave.com/res/v1/web/search"
 BRAVE_IMAGE_URL = "https://api.search.brave.com/res/v1/images/search"
@@ -57,21 +69,299 @@ def _brave_headers(api_key: str = "") -> dict:
     }
 
 
-def execute_search(query: str, max_results: int = 5, brave_api_key: str = "") -> list[dict]:
-    """Run a Brave web search and return results."""
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Requests per second with a burst allowance, handed out in arrival order.
+
+    ``reserve`` always takes a token, going into debt when the bucket is
+    empty, and returns how long the caller must wait before using it. Later
+    callers queue behind the debt, so waiters are served first come first
+    served without a lock.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        self._refill()
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def pause(self, seconds: float):
+        """Hold every new reservation back for ``seconds`` (the API said to slow down)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class BraveClient:
+    """Shared, keep-alive pooled HTTP client for the Brave Search API.
+
+    Every API key gets its own token bucket sized to Brave's per-key quota,
+    so requests beyond the rate wait their turn instead of failing. A 429
+    pauses that key's bucket for the advertised reset time and the request
+    is retried.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 1.0, max_connections: int = 20,
+                 timeout: float = 10.0, max_retries: int = 3):
+        self.rate = rate
+        self.burst = burst
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client: httpx.AsyncClient | None = None
+        self._buckets: dict[str, TokenBucket] = {}
+        self._latencies: deque[float] = deque(maxlen=512)
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.queued = 0
+        self.throttled = 0
+        self.throttled_ms = 0.0
+        self.rate_limited = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _bucket(self, api_key: str) -> TokenBucket:
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        bucket = self._buckets.get(key_hash)
+        if bucket is None:
+            bucket = self._buckets[key_hash] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def _wait_turn(self, bucket: TokenBucket):
+        delay = bucket.reserve()
+        if delay <= 0:
+            return
+        self.throttled += 1
+        self.throttled_ms += delay * 1000
+        self.queued += 1
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.queued -= 1
+
+    async def get(self, url: str, params: dict, api_key: str = "") -> dict:
+        """GET a Brave endpoint and return the JSON body; raises on failure."""
+        key = api_key or BRAVE_API_KEY
+        bucket = self._bucket(key)
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn(bucket)
+            start = time.monotonic()
+            self.requests += 1
+            self.in_flight += 1
+            try:
+                resp = await self._get_client().get(url, headers=_brave_headers(key), params=params)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self._latencies.append((time.monotonic() - start) * 1000)
+            if resp.status_code == 429 and attempt < self.max_retries:
+                self.rate_limited += 1
+                reset = _reset_seconds(resp)
+                logger.info(f"Brave rate limit hit; pausing that key for {reset:.1f}s")
+                bucket.pause(reset)
+                continue
+            if resp.is_error:
+                self.errors += 1
+            resp.raise_for_status()
+            return resp.json()
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "throttled_ms": round(self.throttled_ms, 1),
+            "rate_limited": self.rate_limited,
+            "keys": len(self._buckets),
+            "p50_ms": round(latencies[len(latencies) // 2], 1) if latencies else 0.0,
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else 0.0,
+        }
+
+
+def _reset_seconds(resp: httpx.Response) -> float:
+    # X-RateLimit-Reset lists seconds until each window resets, shortest (per-second) first
+    header = resp.headers.get("x-ratelimit-reset") or resp.headers.get("retry-after") or ""
     try:
-        resp = httpx.get(
+        return max(float(header.split(",")[0]), 1.0)
+    except ValueError:
+        return 1.0
+
+
+brave_client = BraveClient(BRAVE_RATE_PER_SEC, BRAVE_BURST, BRAVE_MAX_CONNECTIONS)
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class SearchCache:
+    """Search results shared by every agent and session.
+
+    Keyed by search kind, safesearch setting, result count and the
+    normalized query. Lookups try an in-memory LRU, then SQLite (shared by
+    workers and kept across restarts); entries older than ``ttl`` seconds
+    are ignored there and refetched. Concurrent lookups of one key share a
+    single Brave request. Error results are never cached.
+
+    Counters are kept overall and per session: ``hits`` (memory),
+    ``db_hits``, ``coalesced`` (joined a request in flight) and ``misses``
+    (went to Brave).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[list[dict], float]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.totals = _new_counters()
+        self._sessions: dict[str, dict] = {}
+
+    @staticmethod
+    def make_key(kind: str, query: str, count: int) -> str:
+        """Cache key for a search, or "" for a blank query (never cached).
+
+        Only case and spacing are normalized: symbols and operators
+        ("C++", "site:", quotes, "-term") change what Brave returns.
+        """
+        normalized = " ".join(query.casefold().split())
+        if not normalized:
+            return ""
+        return f"{kind}:{BRAVE_SAFESEARCH}:{count}:{normalized}"
+
+    def open_session(self, session_id: str) -> dict:
+        """Start per-session counters; pass the returned dict to lookups."""
+        return self._sessions.setdefault(session_id, _new_counters())
+
+    def close_session(self, session_id: str) -> dict:
+        return _with_hit_rate(self._sessions.pop(session_id, _new_counters()))
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[list[dict]]],
+                  session_stats: dict | None = None) -> list[dict]:
+        counters = [self.totals] if session_stats is None else [self.totals, session_stats]
+        if not key:
+            _count(counters, "misses")
+            return await fetch()
+        entry = self._entries.get(key)
+        if entry and time.time() - entry[1] < self.ttl:
+            self._entries.move_to_end(key)
+            _count(counters, "hits")
+            return entry[0]
+
+        task = self._inflight.get(key)
+        joined = task is not None
+        if not joined:
+            task = asyncio.create_task(self._load(key, fetch))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+        results, source = await asyncio.shield(task)
+        _count(counters, "coalesced" if joined else source)
+        return results
+
+    async def _load(self, key: str, fetch: Callable[[], Awaitable[list[dict]]]) -> tuple[list[dict], str]:
+        # The SQLite tier is only a cache: if it fails, search Brave anyway
+        try:
+            cached = await db.get_search(key, self.ttl)
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            self._remember(key, *cached)
+            return cached[0], "db_hits"
+        results = await fetch()
+        if not (results and "error" in results[0]):
+            try:
+                created_at = await db.put_search(key, results, self.ttl)
+            except Exception as e:
+                logger.warning(f"Search cache write failed: {e}")
+                created_at = time.time()
+            self._remember(key, results, created_at)
+        return results, "misses"
+
+    def _remember(self, key: str, results: list[dict], created_at: float):
+        self._entries[key] = (results, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            **_with_hit_rate(self.totals),
+            "entries": len(self._entries),
+            "sessions": {sid: _with_hit_rate(c) for sid, c in self._sessions.items()},
+        }
+
+
+def _new_counters() -> dict:
+    return {"hits": 0, "db_hits": 0, "coalesced": 0, "misses": 0}
+
+
+def _count(counters: list[dict], name: str):
+    for c in counters:
+        c[name] += 1
+
+
+def _with_hit_rate(counters: dict) -> dict:
+    lookups = sum(counters.values())
+    saved = lookups - counters["misses"]
+    return {**counters, "hit_rate": round(saved / lookups, 3) if lookups else 0.0}
+
+
+search_cache = SearchCache(SEARCH_CACHE_ENTRIES, SEARCH_CACHE_TTL_S)
+
+
+# ---------------------------------------------------------------------------
+# Searches
+# ---------------------------------------------------------------------------
+
+async def execute_search(query: str, max_results: int = 5, brave_api_key: str = "",
+                         session_stats: dict | None = None) -> list[dict]:
+    """Run a Brave web search (through the shared cache) and return results."""
+    return await search_cache.get(SearchCache.make_key("web", query, max_results),
+                                  lambda: _fetch_search(query, max_results, brave_api_key),
+                                  session_stats)
+
+
+async def _fetch_search(query: str, max_results: int, brave_api_key: str) -> list[dict]:
+    try:
+        data = await brave_client.get(
             BRAVE_WEB_URL,
-            headers=_brave_headers(brave_api_key),
             params={
                 "q": query,
                 "count": max_results,
                 "safesearch": BRAVE_SAFESEARCH,
             },
-            timeout=10,
+            api_key=brave_api_key,
         )
-        resp.raise_for_status()
-        data = resp.json()
         results = data.get("web", {}).get("results", [])
         return [
             {
@@ -118,21 +408,25 @@ def _pick_best_image_url(image_url: str, thumbnail: str) -> str:
     return image_url or thumbnail
 
 
-def execute_image_search(query: str, max_results: int = 5, brave_api_key: str = "") -> list[dict]:
-    """Run a Brave image search and return results."""
+async def execute_image_search(query: str, max_results: int = 5, brave_api_key: str = "",
+                               session_stats: dict | None = None) -> list[dict]:
+    """Run a Brave image search (through the shared cache) and return results."""
+    return await search_cache.get(SearchCache.make_key("image", query, max_results),
+                                  lambda: _fetch_image_search(query, max_results, brave_api_key),
+                                  session_stats)
+
+
+async def _fetch_image_search(query: str, max_results: int, brave_api_key: str) -> list[dict]:
     try:
-        resp = httpx.get(
+        data = await brave_client.get(
             BRAVE_IMAGE_URL,
-            headers=_brave_headers(brave_api_key),
             params={
                 "q": query,
                 "count": max_results,
                 "safesearch": BRAVE_SAFESEARCH,
             },
-            timeout=10,
+            api_key=brave_api_key,
         )
-        resp.raise_for_status()
-        data = resp.json()
         results = data.get("results", [])
         out = []
         for r in results[:max_results]:
@@ -153,6 +447,26 @@ def execute_image_search(query: str, max_results: int = 5, brave_api_key: str =
         return [{"error": str(e)}]
 
 
+def prefetch_queries(topic: str, count: int = 3) -> list[str]:
+    """Searches a panelist would likely start with, derived from the topic."""
+    base = " ".join(topic.split()[:16])  # Long topics make poor queries
+    return [base, f"{base} data statistics", f"{base} latest news", f"{base} research"][:count]
+
+
+def format_evidence_digest(result_lists: list[list[dict]], max_items: int = 8) -> str:
+    """Merge several searches' results into a short, de-duplicated evidence list."""
+    seen, lines = set(), []
+    for results in result_lists:
+        for r in results:
+            url = r.get("url", "")
+            if "error" in r or not url or url in seen:
+                continue
+            seen.add(url)
+            snippet = re.sub(r"<[^>]+>", "", r.get("snippet", ""))[:240]
+            lines.append(f"- {r.get('title', '')}: {snippet} ({url})")
+    return "\n".join(lines[:max_items])
+
+
 def format_search_results(results: list[dict]) -> str:
     """Format search results as readable text for Claude."""
     if not results:
@@ -0,0 +1,151 @@
+"""Streaming ingestion of multipart file uploads.
+
+The request body is parsed as it arrives. Each file part is buffered in
+memory up to ``spool_bytes`` and then spilled to a named temp file, so a
+burst of large uploads costs disk rather than RAM and extraction workers
+can open the file by path. Per-file and per-request limits are enforced
+while streaming; an oversized upload is rejected without being read in full.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from fastapi import Request
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SpooledUpload:
+    """One uploaded file: in memory while small, a temp file once past the spool size."""
+
+    def __init__(self, filename: str, spool_bytes: int, tmp_dir: str | None = None):
+        self.filename = filename
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self.spool_bytes = spool_bytes
+        self.tmp_dir = tmp_dir
+        self._buffer: bytearray | None = bytearray()
+        self._file = None
+        self.path: str | None = None
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        self._digest.update(data)
+        if self._buffer is not None and len(self._buffer) + len(data) <= self.spool_bytes:
+            self._buffer.extend(data)
+            return
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(prefix="upload-", dir=self.tmp_dir, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer)
+            self._buffer = None
+        self._file.write(data)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of the content, computed while it streamed in."""
+        return self._digest.hexdigest()
+
+    @property
+    def source(self) -> bytes | str:
+        """What ``process_file`` takes: the bytes, or the temp file's path once spilled."""
+        return self.path if self.path else bytes(self._buffer)
+
+    def discard(self):
+        self.finish()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+async def receive_uploads(request: Request, max_file_bytes: int, max_request_bytes: int,
+                          spool_bytes: int = 1024 * 1024, tmp_dir: str | None = None,
+                          field_name: str = "files") -> list[SpooledUpload]:
+    """Stream the ``multipart/form-data`` body into SpooledUploads.
+
+    Only file parts of the ``field_name`` field are kept; other parts are skipped.
+
+    Raises UploadTooLarge or ValueError; partial uploads are discarded first.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_request_bytes:
+        raise UploadTooLarge(f"Upload exceeds the {_mb(max_request_bytes)} request limit")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data upload")
+
+    uploads: list[SpooledUpload] = []
+    current: dict = {"header": b"", "value": b"", "headers": {}, "upload": None}
+
+    def on_part_begin():
+        current["headers"] = {}
+        current["upload"] = None
+
+    def on_header_field(data: bytes, start: int, end: int):
+        current["header"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        current["value"] += data[start:end]
+
+    def on_header_end():
+        current["headers"][current["header"].lower()] = current["value"]
+        current["header"] = current["value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(current["headers"].get(b"content-disposition", b""))
+        if b"filename" in options and options.get(b"name") == field_name.encode():
+            filename = os.path.basename(options[b"filename"].decode("utf-8", errors="replace"))
+            current["upload"] = SpooledUpload(filename or "unknown", spool_bytes, tmp_dir)
+            uploads.append(current["upload"])
+
+    def on_part_data(data: bytes, start: int, end: int):
+        upload = current["upload"]
+        if upload is None:
+            return  # Plain form fields and other fields' files are ignored
+        upload.write(data[start:end])
+        if upload.size > max_file_bytes:
+            raise UploadTooLarge(f"{upload.filename} exceeds the {_mb(max_file_bytes)} per-file limit")
+
+    def on_part_end():
+        if current["upload"] is not None:
+            current["upload"].finish()
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {_mb(max_request_bytes)} request limit")
+            parser.write(chunk)
+        parser.finalize()
+    except BaseException:
+        for upload in uploads:
+            upload.discard()
+        raise
+    return uploads
+
+
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.0f} MB"
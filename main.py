@@ -1,31 +1,42 @@
+import asyncio
 import json
 import uvicorn
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 
+import config
 from agents.registry import AgentRegistry
-from agents.providers import get_providers_for_api
+from agents.providers import get_providers_for_api, provider_pool
+from discussion.search import brave_client, search_cache
 from discussion.engine import DiscussionEngine
 from discussion.models import Discussion
-from discussion.files import process_file
-from database import (
-    init_db, create_session, get_session, get_usage_summary,
-    list_sessions, count_sessions, delete_session,
-)
+from discussion.extraction import ExtractionPool
+from discussion.uploads import UploadTooLarge, receive_uploads
+from discussion.context_store import ContextStore
+from database import init_db, db
 
 app = FastAPI(title="AI Think Tank")
 
 registry = AgentRegistry()
 engine = DiscussionEngine(registry)
 
-file_contexts: dict[str, str] = {}
+context_store = ContextStore(config.FILE_CONTEXT_CACHE_BYTES)
+extraction_pool = ExtractionPool(config.EXTRACT_WORKERS, config.EXTRACT_TIMEOUT_S, config.EXTRACT_MEMORY_MB)
 
 init_db()
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await provider_pool.aclose()
+    await brave_client.aclose()
+    await extraction_pool.aclose()
+    await db.close()
+
+
 @app.get("/")
 async def root():
     return FileResponse("static/index.html")
@@ -53,7 +64,7 @@ async def list_providers():
 
 @app.get("/api/sessions/{session_id}")
 async def get_session_info(session_id: str):
-    session = get_session(session_id)
+    session = await db.get_session(session_id)
     if not session:
         return {"error": "Session not found or ended"}
     return {
@@ -69,42 +80,61 @@ async def get_session_info(session_id: str):
 
 @app.get("/api/sessions")
 async def list_sessions_api(client_id: str = ""):
-    sessions = list_sessions(client_id=client_id, limit=10)
+    sessions = await db.list_sessions(client_id=client_id, limit=10)
     for s in sessions:
         s["agent_keys"] = json.loads(s["agent_keys"])
-    return {"sessions": sessions, "count": count_sessions(client_id=client_id)}
+    return {"sessions": sessions, "count": await db.count_sessions(client_id=client_id)}
 
 
 @app.delete("/api/sessions/{session_id}")
 async def delete_session_api(session_id: str):
-    delete_session(session_id)
+    await db.delete_session(session_id)
     return {"ok": True}
 
 
 @app.get("/api/admin/usage")
 async def admin_usage(start_date: str = None, end_date: str = None):
-    return get_usage_summary(start_date, end_date)
+    return await db.get_usage_summary(start_date, end_date)
+
+
+@app.get("/api/admin/metrics")
+async def admin_metrics():
+    return {"provider_pool": provider_pool.stats(), "database": db.stats(),
+            "search": brave_client.stats(),
+            "search_cache": search_cache.stats(),
+            "file_context_store": context_store.stats(),
+            "extraction": extraction_pool.stats(),
+            "extraction_cache": extraction_pool.cache_stats(), **engine.stats()}
 
 
 @app.post("/api/upload")
-async def upload_files(files: list[UploadFile] = File(...)):
-    """Process uploaded files and return extracted text context."""
-    parts = []
-    filenames = []
-    for f in files:
-        content = await f.read()
-        extracted = process_file(f.filename or "unknown", content)
-        parts.append(extracted)
-        filenames.append(f.filename)
+async def upload_files(request: Request):
+    """Process uploaded files (multipart field ``files``) and return extracted text context."""
+    try:
+        files = await receive_uploads(request, config.UPLOAD_MAX_FILE_BYTES, config.UPLOAD_MAX_REQUEST_BYTES,
+                                      config.UPLOAD_SPOOL_BYTES, config.UPLOAD_TMP_DIR)
+    except UploadTooLarge as e:
+        return JSONResponse({"error": str(e)}, status_code=413)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not files:
+        return JSONResponse({"error": "No files uploaded"}, status_code=400)
+    try:
+        # Files are extracted in parallel in worker processes; results keep upload order
+        parts = await asyncio.gather(*(extraction_pool.extract(f.filename, f.source, f.sha256) for f in files))
+    finally:
+        for f in files:
+            f.discard()
+    filenames = [f.filename for f in files]
     combined = "\n\n".join(parts)
-    file_session_id = str(hash(combined))[:12]
-    file_contexts[file_session_id] = combined
+    file_session_id = await context_store.put(combined)
     return {"file_session_id": file_session_id, "filenames": filenames, "preview": combined[:500]}
 
 
 @app.websocket("/ws/discuss")
 async def discuss(websocket: WebSocket):
     await websocket.accept()
+    claimed_session = ""
     try:
         # First message: session init
         data = await websocket.receive_text()
@@ -120,23 +150,40 @@ async def discuss(websocket: WebSocket):
 
         prior_discussion = None
 
-        # Try to resume existing persistent session
-        if session_id:
-            session = get_session(session_id)
+        # Try to resume existing persistent session. Any worker may serve it:
+        # claiming the lease first waits for the previous worker's final writes.
+        claimed = await db.claim_session(session_id) if session_id else None
+        if claimed is False:
+            # Still live on another connection: two writers would interleave messages
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": "This session is already open in another window",
+            }))
+            await websocket.close()
+            return
+        if claimed:
+            session = await db.get_session(session_id)
             if session and session["status"] == "active":
+                claimed_session = session_id
                 discussion_state = json.loads(session["discussion_state"])
-                prior_discussion = Discussion.from_export(discussion_state)
+                discussion_state["file_context"] = await context_store.get(session["file_context_hash"]) or ""
+                prior_discussion = Discussion.from_export(discussion_state, messages=session["messages"])
                 topic = session["topic"]
                 agent_keys = json.loads(session["agent_keys"])
             else:
-                session_id = ""  # Session not found or ended, will create new
+                await db.release_session(session_id)
+                session_id = ""  # Session ended, will create new
+        else:
+            session_id = ""  # Session not found, will create new
 
         if not topic.strip():
             await websocket.send_text(json.dumps({"type": "error", "message": "Topic cannot be empty"}))
             await websocket.close()
             return
 
-        file_context = file_contexts.get(file_session_id, "")
+        file_context = await context_store.get(file_session_id) or ""
+        if not file_context and prior_discussion and session_id:
+            file_context = prior_discussion.file_context  # Resumed session keeps its upload
 
         # Load from prior_export if provided (file load) and no persistent session
         if prior_export and not prior_discussion:
@@ -149,7 +196,7 @@ async def discuss(websocket: WebSocket):
                 agent_keys=agent_keys or [],
                 file_context=file_context,
             )
-            session_id = create_session(
+            session_id = await db.create_session(
                 topic=topic,
                 agent_keys=agent_keys or [],
                 provider=api_keys.get("provider", ""),
@@ -157,6 +204,8 @@ async def discuss(websocket: WebSocket):
                 discussion_state=discussion_for_db.export(),
                 client_id=client_id,
             )
+            await db.claim_session(session_id)
+            claimed_session = session_id
 
         # Tell frontend the session_id so it can persist it
         await websocket.send_text(json.dumps({
@@ -182,8 +231,13 @@ async def discuss(websocket: WebSocket):
         except Exception:
             pass
     finally:
+        if claimed_session:
+            await db.release_session(claimed_session)
         if websocket.client_state.name != "DISCONNECTED":
-            await websocket.close()
+            try:
+                await websocket.close()
+            except Exception:
+                pass  # Client already went away
 
 
 if __name__ == "__main__":
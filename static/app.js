@@ -79,6 +79,8 @@ const usageCost = document.getElementById("usage-cost");
 // ── State ──
 let ws = null;
 let currentMessageEl = null;
+// Responses still streaming, by agent_key: parallel rounds interleave their chunks
+let streamingMessages = {};   // agent_key -> {el, startTime}
 let allAgents = [];           // from /api/agents
 let allProviders = [];        // from /api/providers
 let selectedAgents = new Set();
@@ -891,6 +893,7 @@ function newChat() {
     autoRunning = false;
     isReady = false;
     currentMessageEl = null;
+    streamingMessages = {};
     currentSpeakingAgent = null;
     lastExport = null;
     priorDiscussion = null;
@@ -1168,6 +1171,7 @@ function handleMessage(data) {
                 color: data.color,
             };
             currentMessageEl = addAgentMessage(data.agent, data.color, data.avatar);
+            streamingMessages[data.agent_key || data.agent] = { el: currentMessageEl, startTime: agentStartTime };
             setChipSpeaking(data.agent, true);
             if (queue.length && queue[0].name === data.agent) {
                 queue.shift();
@@ -1176,12 +1180,23 @@ function handleMessage(data) {
             break;
 
         case "agent_chunk":
-            appendChunk(data.chunk);
+            appendChunk(data.chunk, streamingMessages[data.agent_key || data.agent]?.el);
             break;
 
-        case "agent_done":
+        case "agent_done": {
             currentSpeakingAgent = null;
-            finishMessage(data.agent);
+            const stream = streamingMessages[data.agent_key || data.agent];
+            delete streamingMessages[data.agent_key || data.agent];
+            if (data.failed) {
+                // A parallel panelist errored: drop its cursor (or its empty bubble), keep nothing
+                if (stream) {
+                    stream.el.querySelector(".cursor")?.remove();
+                    if (!stream.el.querySelector(".message-content")?.textContent.trim()) stream.el.remove();
+                }
+                setChipSpeaking(data.agent, false);
+                break;
+            }
+            finishMessage(data.agent, stream?.el, stream?.startTime);
             setChipSpeaking(data.agent, false);
             if (data.usage) {
                 totalInputTokens += data.usage.input_tokens || 0;
@@ -1190,6 +1205,7 @@ function handleMessage(data) {
             }
             saveSessionMessages();
             break;
+        }
 
         case "user_message":
             addUserMessageToChat(data.content);
@@ -1317,7 +1333,7 @@ btnNewRound.addEventListener("click", () => {
     if (!isReady) return;
     isReady = false;
     buildQueueFromSelection();
-    sendCmd({ action: "new_round" });
+    sendCmd({ action: "new_round", context_limit: parseInt(contextLimitSelect.value) || 0 });
 });
 
 btnEnd.addEventListener("click", () => {
@@ -1434,6 +1450,10 @@ fileUpload.addEventListener("change", async () => {
     try {
         const res = await fetch("/api/upload", { method: "POST", body: formData });
         const data = await res.json();
+        if (data.error) {
+            fileStatus.textContent = data.error;
+            return;
+        }
         fileSessionId = data.file_session_id;
         fileStatus.textContent = `${data.filenames.length} file(s) attached`;
     } catch (e) {
@@ -1681,9 +1701,9 @@ function addUserMessageToChat(content) {
     scrollToBottom(true);
 }
 
-function appendChunk(chunk) {
-    if (!currentMessageEl) return;
-    const content = currentMessageEl.querySelector(".message-content");
+function appendChunk(chunk, el = currentMessageEl) {
+    if (!el) return;
+    const content = el.querySelector(".message-content");
     const cursor = content.querySelector(".cursor");
     // Find or create the text node before the cursor
     let textNode = null;
@@ -1702,11 +1722,11 @@ function appendChunk(chunk) {
     scrollToBottom();
 }
 
-function finishMessage(agentNameFromEvent) {
-    if (!currentMessageEl) return;
-    const cursor = currentMessageEl.querySelector(".cursor");
+function finishMessage(agentNameFromEvent, el = currentMessageEl, startTime = agentStartTime) {
+    if (!el) return;
+    const cursor = el.querySelector(".cursor");
     if (cursor) cursor.remove();
-    const content = currentMessageEl.querySelector(".message-content");
+    const content = el.querySelector(".message-content");
     let rawText = content.textContent;
 
     // Strip ---SENTIMENT_DATA--- block and prompt headers from Sentiment Analyst's chat display
@@ -1723,19 +1743,18 @@ function finishMessage(agentNameFromEvent) {
     content.innerHTML = renderMarkdown(rawText);
 
     // Show response time
-    if (agentStartTime) {
-        const elapsed = ((Date.now() - agentStartTime) / 1000).toFixed(1);
-        const nameEl = currentMessageEl.querySelector(".message-name");
+    if (startTime) {
+        const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
+        const nameEl = el.querySelector(".message-name");
         if (nameEl) {
             const timeSpan = document.createElement("span");
             timeSpan.className = "message-time";
             timeSpan.textContent = ` \u00b7 ${elapsed}s`;
             nameEl.appendChild(timeSpan);
         }
-        agentStartTime = null;
     }
 
-    const agentName = agentNameFromEvent || currentMessageEl.querySelector(".message-name")?.textContent || "";
+    const agentName = agentNameFromEvent || el.querySelector(".message-name")?.textContent || "";
 
     // If this is the Sentiment Analyst, capture commentary for the panel
     if (agentName === "Sentiment Analyst" && commentary) {
@@ -1748,7 +1767,10 @@ function finishMessage(agentNameFromEvent) {
         round_num: currentRound,
         timestamp: new Date().toISOString(),
     });
-    currentMessageEl = null;
+    if (el === currentMessageEl) {
+        currentMessageEl = null;
+        agentStartTime = null;
+    }
 }
 
 function renderMarkdown(text) {